@@ -0,0 +1,107 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import jwt
+
+from config import settings
+
+# Identity headers the gateway sets after verifying the token; anything a
+# client sends under these names is dropped before proxying
+USER_ID_HEADER = "x-user-id"
+USER_ROLE_HEADER = "x-user-role"
+GATEWAY_SECRET_HEADER = "x-gateway-secret"
+IDENTITY_HEADERS = (USER_ID_HEADER, USER_ROLE_HEADER, GATEWAY_SECRET_HEADER)
+
+
+class Identity:
+    def __init__(self, user_id: str, role: Optional[str], expires_at: float):
+        self.user_id = user_id
+        self.role = role
+        self.expires_at = expires_at
+
+
+class ClaimsCache:
+    """Verified token -> identity, kept until the token's exp"""
+
+    def __init__(self, max_entries: int, max_ttl: float):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def verify(self, token: str) -> Optional[Identity]:
+        now = time.time()
+        identity = self._entries.get(token)
+        if identity is not None:
+            if identity.expires_at > now:
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return identity
+            del self._entries[token]
+        self.misses += 1
+
+        try:
+            payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        except jwt.InvalidTokenError:
+            self.rejected += 1
+            return None
+        user_id = payload.get("sub")
+        if user_id is None:
+            self.rejected += 1
+            return None
+
+        expires_at = now + self.max_ttl
+        if payload.get("exp") is not None:
+            expires_at = min(expires_at, float(payload["exp"]))
+        identity = Identity(str(user_id), payload.get("role"), expires_at)
+        self._entries[token] = identity
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return identity
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+        }
+
+
+claims_cache = ClaimsCache(settings.JWT_CACHE_MAX_ENTRIES, settings.JWT_CACHE_MAX_TTL)
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if not authorization:
+        return None
+    parts = authorization.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        return None
+    return parts[1]
+
+
+def get_identity(request) -> Optional[Identity]:
+    """Verify the caller's token once per request, memoized on request.state"""
+    if hasattr(request.state, "identity"):
+        return request.state.identity
+    token = bearer_token(request.headers.get("authorization"))
+    identity = claims_cache.verify(token) if token else None
+    request.state.identity = identity
+    return identity
+
+
+def identity_headers(identity: Optional[Identity]) -> list:
+    """Trusted headers for the upstream, only sent when a shared secret is set"""
+    if identity is None or not settings.GATEWAY_SHARED_SECRET:
+        return []
+    headers = [
+        (USER_ID_HEADER, identity.user_id),
+        (GATEWAY_SECRET_HEADER, settings.GATEWAY_SHARED_SECRET),
+    ]
+    if identity.role:
+        headers.append((USER_ROLE_HEADER, identity.role))
+    return headers
@@ -0,0 +1,114 @@
+import random
+import time
+from typing import List, Optional
+
+import httpx
+
+
+class Instance:
+    """One replica of an upstream service with its load and health state"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        url = httpx.URL(self.base_url)
+        self.scheme = url.scheme
+        self.host = url.host
+        self.port = url.port
+        self.netloc = url.netloc.decode("ascii")
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        # When the last ejection ended; health checks may cut ejected_until short
+        self.reinstated_at = 0.0
+        self.ejections = 0
+        self.total_requests = 0
+        self._check_streak = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and self.ejected_until <= now
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "ejected_for": round(max(0.0, self.ejected_until - now), 2),
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.consecutive_failures,
+            "ejections": self.ejections,
+            "total_requests": self.total_requests,
+        }
+
+
+class Balancer:
+    """Picks the replica for each call and takes bad replicas out of rotation.
+
+    Replicas are chosen by fewest outstanding requests, either over all of
+    them or over two picked at random (power of two choices, the default,
+    which avoids every gateway worker piling onto the same idle replica).
+    A replica that fails consecutive_failures calls in a row is ejected for
+    ejection_seconds, longer each time it fails again soon after coming
+    back. The penalty steps back down once per ejection_seconds the replica
+    then stays in rotation, so an occasional success from a flapping replica
+    doesn't reset it. Active health checks mark replicas down and up
+    independently.
+    """
+
+    def __init__(self, instances: List[Instance], strategy: str, consecutive_failures: int,
+                 ejection_seconds: float, max_ejection_percent: float):
+        self.instances = instances
+        self.strategy = strategy
+        self.consecutive_failures = consecutive_failures
+        self.ejection_seconds = ejection_seconds
+        self.max_ejection_percent = max_ejection_percent
+
+    def pick(self, exclude: Optional[Instance] = None) -> Instance:
+        instances = self.instances
+        if len(instances) == 1:
+            return instances[0]
+        now = time.monotonic()
+        candidates = [i for i in instances if i is not exclude and i.available(now)]
+        if not candidates:
+            # Everything looks down, trying beats failing outright
+            candidates = [i for i in instances if i is not exclude] or instances
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.strategy == "least_outstanding":
+            least = min(i.outstanding for i in candidates)
+            return random.choice([i for i in candidates if i.outstanding == least])
+        first, second = random.sample(candidates, 2)
+        return first if first.outstanding <= second.outstanding else second
+
+    def record(self, instance: Instance, success: bool):
+        """Passive outlier detection from real traffic"""
+        if success:
+            instance.consecutive_failures = 0
+            return
+        instance.consecutive_failures += 1
+        if instance.consecutive_failures < self.consecutive_failures or len(self.instances) == 1:
+            return
+        now = time.monotonic()
+        ejected = sum(1 for i in self.instances if i.ejected_until > now)
+        if ejected + 1 > len(self.instances) * self.max_ejection_percent / 100:
+            return
+        instance.consecutive_failures = 0
+        if instance.ejections:
+            quiet = now - instance.reinstated_at
+            instance.ejections = max(0, instance.ejections - int(quiet // self.ejection_seconds))
+        instance.ejections += 1
+        instance.ejected_until = now + self.ejection_seconds * min(instance.ejections, 5)
+        instance.reinstated_at = instance.ejected_until
+
+    def record_check(self, instance: Instance, ok: bool, threshold: int):
+        """Flip health only after `threshold` checks in a row disagree with it"""
+        if ok == instance.healthy:
+            instance._check_streak = 0
+            return
+        instance._check_streak += 1
+        if instance._check_streak >= threshold:
+            instance.healthy = ok
+            instance._check_streak = 0
+            if ok:
+                instance.ejected_until = 0.0
+            print(f"Upstream {instance.base_url} is {'healthy' if ok else 'unhealthy'}")
@@ -0,0 +1,86 @@
+"""Compare bytes on the wire and latency with and without compression.
+
+Run against a gateway that is already up, e.g.
+    python bench_compression.py --url http://localhost:8090/event/graphql --requests 200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+# Fields of event-service's EventType, a list big enough to pass the compression threshold
+DEFAULT_QUERY = "{ events { id title description venueId roomId startTime endTime status } }"
+
+
+class QueryFailed(Exception):
+    pass
+
+
+def check_payload(status_code: int, raw: bytes):
+    """An error body is small and barely compresses, measuring it means nothing"""
+    try:
+        payload = json.loads(raw)
+    except ValueError:
+        raise QueryFailed(f"Response is not JSON (status {status_code}): {raw[:200]!r}")
+    if status_code != 200 or not isinstance(payload, dict) or payload.get("errors"):
+        raise QueryFailed(f"Query failed (status {status_code}): {json.dumps(payload)[:500]}")
+
+
+async def run(url: str, query: str, encoding: str, total: int, concurrency: int):
+    body = json.dumps({"query": query})
+    headers = {"Content-Type": "application/json", "Accept-Encoding": encoding}
+    latencies, wire_bytes, body_bytes = [], 0, 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def one():
+            nonlocal wire_bytes, body_bytes
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, content=body, headers=headers)
+                raw = response.content  # decoded by httpx
+                latencies.append(time.perf_counter() - started)
+                check_payload(response.status_code, raw)
+                wire_bytes += response.num_bytes_downloaded
+                body_bytes += len(raw)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "encoding": encoding,
+        "avg_wire_bytes": wire_bytes // total,
+        "avg_body_bytes": body_bytes // total,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "req_per_s": round(total / elapsed, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8090/event/graphql")
+    parser.add_argument("--query", default=DEFAULT_QUERY)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    for encoding in ("identity", "gzip", "br"):
+        try:
+            result = await run(args.url, args.query, encoding, args.requests, args.concurrency)
+        except QueryFailed as exc:
+            raise SystemExit(str(exc))
+        print(
+            f"{result['encoding']:>8}: {result['avg_wire_bytes']:>8} B on the wire "
+            f"({result['avg_body_bytes']} B decoded), p50 {result['p50_ms']} ms, "
+            f"p95 {result['p95_ms']} ms, {result['req_per_s']} req/s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from graphql_ops import Operation
+
+
+class CachedResponse:
+    def __init__(self, status_code: int, headers: List[Tuple[str, str]], body: bytes, expires_at: float):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(name) + len(value) for name, value in self.headers)
+
+
+class ResponseCache:
+    """TTL + LRU cache of GraphQL query responses, bounded by total bytes"""
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Bumped on every mutation so in-flight misses don't store stale data
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(service: str, path: str, operation: Operation, auth_scope: str) -> str:
+        raw = "\x00".join([
+            service,
+            path,
+            operation.operation_name or "",
+            operation.normalized_query,
+            operation.variables_key(),
+            auth_scope,
+        ])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def generation(self, service: str) -> int:
+        return self._generations.get(service, 0)
+
+    def get(self, service: str, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get((service, key))
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                self._remove((service, key))
+            self.misses += 1
+            return None
+        self._entries.move_to_end((service, key))
+        self.hits += 1
+        return entry
+
+    def set(self, service: str, key: str, status_code: int, headers: List[Tuple[str, str]],
+            body: bytes, generation: int):
+        if generation != self.generation(service):
+            return
+        entry = CachedResponse(status_code, headers, body, time.monotonic() + self.ttl)
+        if entry.size > self.max_bytes:
+            return
+        self._remove((service, key))
+        self._entries[(service, key)] = entry
+        self._bytes += entry.size
+        self.stores += 1
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, service: str):
+        self._generations[service] = self.generation(service) + 1
+        for entry_key in [k for k in self._entries if k[0] == service]:
+            self._remove(entry_key)
+        self.invalidations += 1
+
+    def _remove(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
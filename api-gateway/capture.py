@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from typing import Optional
+
+from graphql import GraphQLError, parse, print_ast
+from graphql.language import ArgumentNode, StringValueNode, VariableNode, Visitor, visit
+
+from config import settings
+from graphql_ops import parse_operation, persisted_queries
+
+# Argument and variable names whose values never reach the capture file
+SENSITIVE = re.compile(r"pass|token|secret|auth|card|cvv|otp", re.IGNORECASE)
+REDACTED = "REDACTED"
+
+
+class _RedactArguments(Visitor):
+    def __init__(self):
+        super().__init__()
+        # Variables passed to sensitive arguments, e.g. login(password: $p)
+        self.variables = set()
+
+    def enter_argument(self, node: ArgumentNode, *_):
+        if not SENSITIVE.search(node.name.value):
+            return None
+        if isinstance(node.value, VariableNode):
+            self.variables.add(node.value.name.value)
+        elif isinstance(node.value, StringValueNode):
+            return ArgumentNode(name=node.name, value=StringValueNode(value=REDACTED))
+        return None
+
+
+def _redact_query(query: str):
+    """Returns the redacted query and the variables that must be redacted too"""
+    redactor = _RedactArguments()
+    try:
+        return print_ast(visit(parse(query), redactor)), redactor.variables
+    except GraphQLError:
+        return query, set()
+
+
+def _redact_values(value, names=frozenset()):
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if (key in names or SENSITIVE.search(key)) and value[key] is not None
+            else _redact_values(value[key])
+            for key in value
+        }
+    if isinstance(value, list):
+        return [_redact_values(item) for item in value]
+    return value
+
+
+def sanitize_body(body: bytes) -> Optional[dict]:
+    """GraphQL body without secrets, hash-only bodies get their query text back"""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    query, _ = persisted_queries.resolve(payload)
+    sanitized = {}
+    sensitive_variables = set()
+    if isinstance(query, str):
+        sanitized["query"], sensitive_variables = _redact_query(query)
+    if payload.get("variables"):
+        sanitized["variables"] = _redact_values(payload["variables"], sensitive_variables)
+    if payload.get("operationName"):
+        sanitized["operationName"] = payload["operationName"]
+    return sanitized
+
+
+class TrafficCapture:
+    """Appends one sanitized JSON line per request to a capture file.
+
+    Lines are buffered in memory and written from a worker thread once a
+    second, so recording never waits on the disk. Headers are never
+    captured; only whether the caller was authenticated and with which role.
+    """
+
+    def __init__(self, path: str, sample_rate: float, max_bytes: int, flush_interval: float = 1.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.enabled = bool(path)
+        self._pending = []
+        self._written = os.path.getsize(path) if path and os.path.exists(path) else 0
+        self.records = 0
+        self.dropped = 0
+
+    def record(self, route: str, request, body: Optional[bytes], status_code: int,
+               response_bytes: Optional[int], duration: float, role: Optional[str]):
+        if not self.enabled or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return
+        if self._written >= self.max_bytes:
+            self.dropped += 1
+            return
+        entry = {
+            "t": round(time.time(), 4),
+            "route": route,
+            "method": request.method,
+            "path": request.url.path,
+            "status": status_code,
+            "bytes": response_bytes,
+            "ms": round(duration * 1000, 2),
+            "auth": role,
+        }
+        if request.url.query:
+            entry["qs"] = request.url.query
+        if body:
+            operation = parse_operation(body)
+            if operation is not None:
+                entry["op"] = f"{operation.operation_type} {','.join(operation.root_fields)}"
+            entry["body"] = sanitize_body(body)
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        self._written += len(line)
+        self._pending.append(line)
+        self.records += 1
+
+    def _write(self, lines):
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.writelines(lines)
+
+    async def flush(self):
+        if self._pending:
+            lines, self._pending = self._pending, []
+            await asyncio.to_thread(self._write, lines)
+
+    async def run(self):
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        finally:
+            if self._pending:
+                self._write(self._pending)
+                self._pending = []
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "records": self.records,
+            "dropped": self.dropped,
+            "bytes_written": self._written,
+            "max_bytes": self.max_bytes,
+        }
+
+
+capture = TrafficCapture(
+    settings.CAPTURE_FILE,
+    sample_rate=settings.CAPTURE_SAMPLE_RATE,
+    max_bytes=settings.CAPTURE_MAX_BYTES,
+)
@@ -0,0 +1,101 @@
+import zlib
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
+
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/graphql",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+@lru_cache(maxsize=256)
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best encoding the client accepts, brotli preferred over gzip"""
+    if not accept_encoding or not settings.COMPRESSION_ENABLED:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def should_compress(headers: List[Tuple[str, str]], size: Optional[int]) -> bool:
+    """Compress only uncompressed text-like bodies that are big enough (or of unknown size)"""
+    content_type = ""
+    for name, value in headers:
+        lowered = name.lower()
+        if lowered == "content-encoding":
+            # Already encoded by the upstream, pass it through untouched
+            return False
+        if lowered == "content-type":
+            content_type = value.lower()
+    if not content_type.startswith(COMPRESSIBLE_TYPES):
+        return False
+    return size is None or size >= settings.COMPRESSION_MIN_BYTES
+
+
+def encoded_headers(headers: List[Tuple[str, str]], encoding: str) -> List[Tuple[str, str]]:
+    # The length changes, streaming bodies go out chunked instead
+    headers = [(name, value) for name, value in headers if name.lower() != "content-length"]
+    headers.append(("content-encoding", encoding))
+    headers.append(("vary", "Accept-Encoding"))
+    return headers
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+            self._compress = self._compressor.process
+            self._finish = self._compressor.finish
+        else:
+            # wbits 31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress = self._compressor.compress
+            self._finish = self._compressor.flush
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compress(chunk)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    compressor = _Compressor(encoding)
+    return compressor.compress(body) + compressor.finish()
+
+
+async def compress_stream(chunks: AsyncIterator[bytes], encoding: str) -> AsyncIterator[bytes]:
+    """Compress chunk by chunk, only the compressor window is held in memory"""
+    compressor = _Compressor(encoding)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.finish()
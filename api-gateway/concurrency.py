@@ -0,0 +1,164 @@
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+from config import settings
+
+# Priority classes, lower value gets capacity first
+HIGH = 0      # booking mutations that make money
+NORMAL = 1    # every other mutation
+LOW = 2       # reads, shed first under overload
+
+PRIORITY_NAMES = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+
+# Share of the current limit each class may fill while the upstream is
+# congested, so reads leave headroom for mutations. A healthy upstream
+# gets the whole limit for every class.
+PRIORITY_SHARES = {HIGH: 1.0, NORMAL: 0.9, LOW: 0.7}
+
+# How long a request may queue for a slot before it is shed (seconds)
+PRIORITY_MAX_WAIT = {HIGH: 2.0, NORMAL: 1.0, LOW: 0.5}
+
+
+class OverloadedError(Exception):
+    """Raised when a request is shed instead of being sent upstream"""
+
+    def __init__(self, service: str, priority: int, retry_after: float = 1.0):
+        super().__init__(f"{service} service is overloaded, {PRIORITY_NAMES[priority]} priority request shed")
+        self.service = service
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+def classify(operation_type: str, root_fields) -> int:
+    if operation_type != "mutation":
+        return LOW
+    if any(field in settings.HIGH_PRIORITY_MUTATIONS for field in root_fields):
+        return HIGH
+    return NORMAL
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit per upstream, adjusted from observed latency.
+
+    Congestion is the gradient of the smoothed latency against the best
+    latency recently seen: the upstream counts as congested once it climbs
+    past that baseline times the tolerance. Until the first congestion or
+    failure the limit grows by one slot per success (slow start), then by
+    roughly one slot per round trip. It is cut at most once per round trip,
+    by the backoff or by the gradient when latency rose further than that.
+    """
+
+    def __init__(self, service: str, initial: int, min_limit: int, max_limit: int,
+                 tolerance: float, backoff: float, baseline_window: float = 30.0,
+                 smoothing: float = 0.2):
+        self.service = service
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.baseline_window = baseline_window
+        self.smoothing = smoothing
+        self.in_flight = 0
+        self._waiters = {priority: deque() for priority in PRIORITY_SHARES}
+        self._min_latency: Optional[float] = None
+        self._latency: Optional[float] = None
+        self._slow_start = True
+        self._baseline_started = time.monotonic()
+        self._last_decrease = 0.0
+        self.shed = {priority: 0 for priority in PRIORITY_SHARES}
+
+    @property
+    def congested(self) -> bool:
+        if self._min_latency is None or self._latency is None:
+            return False
+        # The absolute floor keeps millisecond jitter from counting as congestion
+        return self._latency > max(self._min_latency * self.tolerance, self._min_latency + 0.01)
+
+    def _capacity(self, priority: int) -> int:
+        share = PRIORITY_SHARES[priority] if self.congested else 1.0
+        return max(1, int(self.limit * share))
+
+    def _has_waiters(self, up_to: int) -> bool:
+        return any(self._waiters[priority] for priority in self._waiters if priority <= up_to)
+
+    async def acquire(self, priority: int):
+        if self.in_flight < self._capacity(priority) and not self._has_waiters(priority):
+            self.in_flight += 1
+            return
+        max_wait = PRIORITY_MAX_WAIT[priority]
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            # The slot is counted by _wake before the future is resolved
+            await asyncio.wait_for(waiter, max_wait)
+        except asyncio.TimeoutError:
+            self.shed[priority] += 1
+            raise OverloadedError(self.service, priority)
+        except asyncio.CancelledError:
+            # Granted just as the caller went away, hand the slot back
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters[priority]:
+                self._waiters[priority].remove(waiter)
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def record(self, latency: float, success: bool):
+        now = time.monotonic()
+        if now - self._baseline_started > self.baseline_window:
+            # Let the baseline drift up if the upstream got slower for good
+            self._min_latency = None
+            self._baseline_started = now
+        if self._min_latency is None or latency < self._min_latency:
+            self._min_latency = latency
+        if self._latency is None:
+            self._latency = latency
+        else:
+            # Smoothed so a single slow reply is not read as congestion
+            self._latency += self.smoothing * (latency - self._latency)
+
+        congested = self.congested
+        if not success or congested:
+            self._slow_start = False
+            # At most one cut per round trip, concurrent slow replies share it
+            if now - self._last_decrease >= latency:
+                factor = self.backoff
+                if congested:
+                    # Latency far above the baseline cuts deeper, but never below half
+                    gradient = self._min_latency * self.tolerance / self._latency
+                    factor = max(0.5, min(self.backoff, gradient))
+                self.limit = max(self.min_limit, self.limit * factor)
+                self._last_decrease = now
+        elif self.in_flight >= self.limit / 2:
+            step = 1.0 if self._slow_start else 1.0 / self.limit
+            self.limit = min(self.max_limit, self.limit + step)
+        self._wake()
+
+    def _wake(self):
+        for priority in sorted(self._waiters):
+            queue = self._waiters[priority]
+            while queue and self.in_flight < self._capacity(priority):
+                waiter = queue.popleft()
+                if waiter.done():
+                    continue
+                self.in_flight += 1
+                waiter.set_result(True)
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "min_latency_ms": round(self._min_latency * 1000, 2) if self._min_latency is not None else None,
+            "latency_ms": round(self._latency * 1000, 2) if self._latency is not None else None,
+            "congested": self.congested,
+            "slow_start": self._slow_start,
+            "waiting": {PRIORITY_NAMES[p]: len(q) for p, q in self._waiters.items()},
+            "shed": {PRIORITY_NAMES[p]: count for p, count in self.shed.items()},
+        }
@@ -0,0 +1,145 @@
+import os
+
+
+def _get_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _get_list(name: str, default: str) -> list:
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+
+def _get_rate_limits(name: str, default: str) -> dict:
+    # "route:rate:burst" entries, e.g. "user:10:20,booking:20:40"
+    limits = {}
+    for item in _get_list(name, default):
+        route, rate, burst = item.split(":")
+        limits[route.strip().strip("/")] = (float(rate), float(burst))
+    return limits
+
+
+class Settings:
+    # Service URLs from environment variables, comma separated for several replicas
+    BOOKING_SERVICE_URL: str = os.getenv("BOOKING_SERVICE_URL", "http://booking-service:8000")
+    EVENT_SERVICE_URL: str = os.getenv("EVENT_SERVICE_URL", "http://event-service:8000")
+    TICKET_SERVICE_URL: str = os.getenv("TICKET_SERVICE_URL", "http://ticket-service:8000")
+    USER_SERVICE_URL: str = os.getenv("USER_SERVICE_URL", "http://user-service:8000")
+
+    # Connection pool shared by every request to the same upstream
+    UPSTREAM_MAX_CONNECTIONS: int = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", 100))
+    UPSTREAM_MAX_KEEPALIVE: int = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", 20))
+    UPSTREAM_KEEPALIVE_EXPIRY: float = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", 30.0))
+    UPSTREAM_HTTP2: bool = _get_bool("UPSTREAM_HTTP2", False)
+
+    # Replica selection and health for upstreams with several URLs
+    LOAD_BALANCER: str = os.getenv("LOAD_BALANCER", "p2c")  # p2c or least_outstanding
+    HEALTH_CHECK_INTERVAL: float = float(os.getenv("HEALTH_CHECK_INTERVAL", 10.0))
+    HEALTH_CHECK_TIMEOUT: float = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2.0))
+    HEALTH_CHECK_THRESHOLD: int = int(os.getenv("HEALTH_CHECK_THRESHOLD", 2))
+    OUTLIER_CONSECUTIVE_FAILURES: int = int(os.getenv("OUTLIER_CONSECUTIVE_FAILURES", 5))
+    OUTLIER_EJECTION_SECONDS: float = float(os.getenv("OUTLIER_EJECTION_SECONDS", 30.0))
+    OUTLIER_MAX_EJECTION_PERCENT: float = float(os.getenv("OUTLIER_MAX_EJECTION_PERCENT", 50.0))
+
+    # Default timeouts, overridable per upstream (e.g. TICKET_SERVICE_TIMEOUT=3)
+    UPSTREAM_TIMEOUT: float = float(os.getenv("UPSTREAM_TIMEOUT", 10.0))
+    UPSTREAM_CONNECT_TIMEOUT: float = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", 2.0))
+
+    # Circuit breaker per upstream
+    BREAKER_FAILURE_RATE: float = float(os.getenv("BREAKER_FAILURE_RATE", 0.5))
+    BREAKER_SLOW_CALL_RATE: float = float(os.getenv("BREAKER_SLOW_CALL_RATE", 0.8))
+    BREAKER_SLOW_CALL_SECONDS: float = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", 5.0))
+    BREAKER_MIN_REQUESTS: int = int(os.getenv("BREAKER_MIN_REQUESTS", 20))
+    BREAKER_WINDOW_SECONDS: int = int(os.getenv("BREAKER_WINDOW_SECONDS", 10))
+    BREAKER_OPEN_SECONDS: float = float(os.getenv("BREAKER_OPEN_SECONDS", 15.0))
+    BREAKER_HALF_OPEN_PROBES: int = int(os.getenv("BREAKER_HALF_OPEN_PROBES", 3))
+
+    # Retries of idempotent reads, bounded by a budget per upstream
+    RETRY_MAX_ATTEMPTS: int = int(os.getenv("RETRY_MAX_ATTEMPTS", 2))
+    RETRY_BUDGET_RATIO: float = float(os.getenv("RETRY_BUDGET_RATIO", 0.2))
+    RETRY_MIN_PER_SECOND: float = float(os.getenv("RETRY_MIN_PER_SECOND", 1.0))
+
+    # Adaptive concurrency limit per upstream with priority load shedding
+    CONCURRENCY_LIMIT_ENABLED: bool = _get_bool("CONCURRENCY_LIMIT_ENABLED", True)
+    # 0 = start from the upstream pool size (UPSTREAM_MAX_CONNECTIONS)
+    CONCURRENCY_INITIAL_LIMIT: int = int(os.getenv("CONCURRENCY_INITIAL_LIMIT", 0))
+    CONCURRENCY_MIN_LIMIT: int = int(os.getenv("CONCURRENCY_MIN_LIMIT", 5))
+    CONCURRENCY_MAX_LIMIT: int = int(os.getenv("CONCURRENCY_MAX_LIMIT", 200))
+    CONCURRENCY_LATENCY_TOLERANCE: float = float(os.getenv("CONCURRENCY_LATENCY_TOLERANCE", 2.0))
+    CONCURRENCY_BACKOFF: float = float(os.getenv("CONCURRENCY_BACKOFF", 0.9))
+    HIGH_PRIORITY_MUTATIONS: list = _get_list("HIGH_PRIORITY_MUTATIONS", "createBooking,confirmPayment")
+
+    # Token bucket per client (JWT user id, else IP) and route prefix
+    RATE_LIMIT_ENABLED: bool = _get_bool("RATE_LIMIT_ENABLED", True)
+    RATE_LIMITS: dict = _get_rate_limits(
+        "RATE_LIMITS", "user:10:20,booking:20:40,event:100:200,ticket:100:200,graphql:50:100"
+    )
+    RATE_LIMIT_SHARDS: int = int(os.getenv("RATE_LIMIT_SHARDS", 16))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+
+    # Pipe request/response bodies chunk by chunk instead of buffering them
+    STREAM_PROXY: bool = _get_bool("STREAM_PROXY", True)
+    # POST bodies up to this size are read to classify the GraphQL operation
+    # (cache, coalescing, priority); larger or chunked ones stream through
+    GRAPHQL_INSPECT_MAX_BYTES: int = int(os.getenv("GRAPHQL_INSPECT_MAX_BYTES", 64 * 1024))
+
+    # Response compression negotiated from Accept-Encoding (brotli when installed)
+    COMPRESSION_ENABLED: bool = _get_bool("COMPRESSION_ENABLED", True)
+    COMPRESSION_MIN_BYTES: int = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", 6))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", 4))
+
+    # Gateway-side cache for read-only GraphQL queries
+    RESPONSE_CACHE_ENABLED: bool = _get_bool("RESPONSE_CACHE_ENABLED", True)
+    RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", 10.0))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1000))
+    RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    RESPONSE_CACHE_ROUTES: list = _get_list("RESPONSE_CACHE_ROUTES", "event,ticket")
+    # Larger query replies are streamed to the client instead of cached/coalesced
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", 1024 * 1024))
+
+    # Concurrent identical GraphQL queries share one upstream call
+    COALESCE_ENABLED: bool = _get_bool("COALESCE_ENABLED", True)
+    COALESCE_ROUTES: list = _get_list("COALESCE_ROUTES", "event,ticket")
+
+    # Opt-in traffic capture for load-test replay, off while CAPTURE_FILE is empty
+    CAPTURE_FILE: str = os.getenv("CAPTURE_FILE", "")
+    CAPTURE_SAMPLE_RATE: float = float(os.getenv("CAPTURE_SAMPLE_RATE", 1.0))
+    CAPTURE_MAX_BYTES: int = int(os.getenv("CAPTURE_MAX_BYTES", 100 * 1024 * 1024))
+
+    # Automatic persisted queries, sha256 -> query text remembered by the gateway
+    PERSISTED_QUERY_MAX_ENTRIES: int = int(os.getenv("PERSISTED_QUERY_MAX_ENTRIES", 1000))
+
+    # Seconds between introspection retries for the federated /graphql schema
+    FEDERATION_REFRESH_INTERVAL: float = float(os.getenv("FEDERATION_REFRESH_INTERVAL", 30.0))
+    # Client headers /graphql passes on to the services, like the per-service routes do
+    FEDERATION_FORWARD_HEADERS: list = _get_list("FEDERATION_FORWARD_HEADERS", "Idempotency-Key")
+
+    # Edge JWT verification, same secret the services use to sign/verify tokens
+    JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "dev-secret-123")
+    JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
+    JWT_CACHE_MAX_ENTRIES: int = int(os.getenv("JWT_CACHE_MAX_ENTRIES", 10000))
+    JWT_CACHE_MAX_TTL: float = float(os.getenv("JWT_CACHE_MAX_TTL", 3600.0))
+    # Services only trust X-User-Id/X-User-Role when this secret matches theirs
+    GATEWAY_SHARED_SECRET: str = os.getenv("GATEWAY_SHARED_SECRET", "")
+
+    def upstream_timeout(self, name: str) -> float:
+        return float(os.getenv(f"{name.upper()}_SERVICE_TIMEOUT", self.UPSTREAM_TIMEOUT))
+
+
+settings = Settings()
+
+UPSTREAM_URLS = {
+    "booking": settings.BOOKING_SERVICE_URL,
+    "event": settings.EVENT_SERVICE_URL,
+    "ticket": settings.TICKET_SERVICE_URL,
+    "user": settings.USER_SERVICE_URL,
+}
+
+# Mutations that change data owned by another upstream, whose cached reads
+# must be dropped too (confirmPayment updates ticket sold counts)
+CACHE_CROSS_INVALIDATION = {
+    "confirmPayment": ["ticket"],
+}
@@ -0,0 +1,343 @@
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from graphql import (
+    GraphQLError,
+    GraphQLObjectType,
+    GraphQLSchema,
+    build_client_schema,
+    execute,
+    get_introspection_query,
+    parse,
+    print_ast,
+)
+from graphql.language import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    InlineFragmentNode,
+    OperationDefinitionNode,
+    SelectionSetNode,
+    VariableNode,
+    Visitor,
+    visit,
+)
+
+from concurrency import LOW
+from config import settings
+from graphql_ops import is_persisted_query_not_found, persisted_query_extensions
+from upstreams import UPSTREAM_ERRORS
+
+GRAPHQL_PATH = "graphql"
+
+# Used until the upstreams answer introspection (or when they never do)
+DEFAULT_ROOT_FIELDS = {
+    "query": {
+        "users": "user", "user": "user", "me": "user", "ticketServiceToken": "user",
+        "events": "event", "event": "event", "eventsByVenue": "event",
+        "ticketTypesByEvent": "ticket", "ticketType": "ticket",
+        "booking": "booking", "bookingsByUser": "booking",
+    },
+    "mutation": {
+        "createUser": "user", "login": "user", "updateUser": "user", "deleteUser": "user",
+        "createEvent": "event", "updateEvent": "event", "blockSchedule": "event",
+        "createTicketType": "ticket", "updateTicketType": "ticket",
+        "updateTicketSold": "ticket", "deleteTicketType": "ticket",
+        "createBooking": "booking", "confirmPayment": "booking", "cancelBooking": "booking",
+    },
+}
+
+
+class _UsageCollector(Visitor):
+    def __init__(self):
+        super().__init__()
+        self.variables = set()
+        self.fragments = set()
+
+    def enter_variable(self, node: VariableNode, *_):
+        self.variables.add(node.name.value)
+
+    def enter_fragment_spread(self, node: FragmentSpreadNode, *_):
+        self.fragments.add(node.name.value)
+
+
+def _collect_usage(node, fragments: Dict[str, FragmentDefinitionNode]):
+    """Variables and fragments used by a node, following fragment spreads"""
+    collector = _UsageCollector()
+    visit(node, collector)
+    pending = list(collector.fragments)
+    seen = set()
+    while pending:
+        name = pending.pop()
+        if name in seen or name not in fragments:
+            continue
+        seen.add(name)
+        nested = _UsageCollector()
+        visit(fragments[name], nested)
+        collector.variables.update(nested.variables)
+        pending.extend(nested.fragments)
+    collector.fragments = seen
+    return collector
+
+
+def _flatten_root(selection_set: SelectionSetNode, fragments) -> List[FieldNode]:
+    """Inline fragments spread directly on the root type into plain fields"""
+    fields = []
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            fields.append(selection)
+        elif isinstance(selection, InlineFragmentNode):
+            fields.extend(_flatten_root(selection.selection_set, fragments))
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = fragments.get(selection.name.value)
+            if fragment is None:
+                raise GraphQLError(f"Unknown fragment '{selection.name.value}'.")
+            fields.extend(_flatten_root(fragment.selection_set, fragments))
+    return fields
+
+
+class SubQuery:
+    def __init__(self, service: str, fields: List[FieldNode], query: str, variables: dict):
+        self.service = service
+        self.fields = fields
+        self.query = query
+        self.variables = variables
+
+    @property
+    def response_keys(self) -> List[str]:
+        return [field.alias.value if field.alias else field.name.value for field in self.fields]
+
+
+class FederatedSchema:
+    """Routes root fields of one gateway operation to the owning services"""
+
+    def __init__(self):
+        self.root_fields = {kind: dict(fields) for kind, fields in DEFAULT_ROOT_FIELDS.items()}
+        self.schema: Optional[GraphQLSchema] = None
+        self.ready = False
+
+    async def refresh(self, upstreams: dict):
+        """Introspect every upstream and rebuild the merged schema"""
+        introspection = json.dumps({"query": get_introspection_query()})
+
+        async def fetch(name, upstream):
+            response = await upstream.client.post(
+                upstream.url(GRAPHQL_PATH),
+                content=introspection,
+                headers={"Content-Type": "application/json"},
+            )
+            response.raise_for_status()
+            return name, build_client_schema(response.json()["data"])
+
+        results = await asyncio.gather(
+            *(fetch(name, upstream) for name, upstream in upstreams.items()),
+            return_exceptions=True,
+        )
+        schemas = {}
+        for result in results:
+            if isinstance(result, BaseException):
+                print(f"Federation: introspection failed ({result})")
+                continue
+            name, schema = result
+            schemas[name] = schema
+        if len(schemas) != len(upstreams):
+            return False
+
+        query_fields, mutation_fields = {}, {}
+        root_fields = {"query": {}, "mutation": {}}
+        for name, schema in schemas.items():
+            for kind, root_type, merged in (
+                ("query", schema.query_type, query_fields),
+                ("mutation", schema.mutation_type, mutation_fields),
+            ):
+                if root_type is None:
+                    continue
+                for field_name, field in root_type.fields.items():
+                    if field_name in merged:
+                        print(f"Federation: '{field_name}' is defined by more than one service")
+                        continue
+                    merged[field_name] = field
+                    root_fields[kind][field_name] = name
+
+        try:
+            self.schema = GraphQLSchema(
+                query=GraphQLObjectType("Query", query_fields),
+                mutation=GraphQLObjectType("Mutation", mutation_fields) if mutation_fields else None,
+            )
+        except (TypeError, GraphQLError) as exc:
+            # Conflicting type names across services, routing still works
+            print(f"Federation: could not merge schemas ({exc})")
+            self.schema = None
+        self.root_fields = root_fields
+        self.ready = True
+        return True
+
+    def plan(self, document: DocumentNode, operation_name: Optional[str], variables: dict):
+        """Split an operation into per-service documents.
+
+        Returns the operation type, the sub-queries and the response keys in
+        the order the client selected them.
+        """
+        operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+        if operation_name:
+            operations = [op for op in operations if op.name and op.name.value == operation_name]
+        if len(operations) != 1:
+            raise GraphQLError("Must provide exactly one operation, or a valid operationName.")
+        operation = operations[0]
+        kind = operation.operation.value
+        if kind not in self.root_fields:
+            raise GraphQLError(f"Operation type '{kind}' is not supported by the gateway.")
+
+        fragments = {
+            d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)
+        }
+        groups, order = [], []
+        for field in _flatten_root(operation.selection_set, fragments):
+            name = field.name.value
+            if name.startswith("__"):
+                service = "gateway"
+            else:
+                service = self.root_fields[kind].get(name)
+                if service is None:
+                    root = "Query" if kind == "query" else "Mutation"
+                    raise GraphQLError(f"Cannot query field '{name}' on type '{root}'.")
+            order.append(field.alias.value if field.alias else name)
+            if kind == "query":
+                # Queries run concurrently, so one call per service is enough
+                group = next((g for g in groups if g[0] == service), None)
+            else:
+                # Mutations keep their serial order, only adjacent fields share a call
+                group = groups[-1] if groups and groups[-1][0] == service else None
+            if group is None:
+                groups.append((service, [field]))
+            else:
+                group[1].append(field)
+
+        plan = []
+        for service, fields in groups:
+            selection_set = SelectionSetNode(selections=tuple(fields))
+            usage = _collect_usage(selection_set, fragments)
+            sub_operation = OperationDefinitionNode(
+                operation=operation.operation,
+                name=operation.name,
+                variable_definitions=tuple(
+                    v for v in operation.variable_definitions or ()
+                    if v.variable.name.value in usage.variables
+                ),
+                directives=operation.directives,
+                selection_set=selection_set,
+            )
+            sub_document = DocumentNode(definitions=tuple(
+                [sub_operation] + [fragments[name] for name in sorted(usage.fragments)]
+            ))
+            sub_variables = {k: v for k, v in variables.items() if k in usage.variables}
+            plan.append(SubQuery(service, fields, print_ast(sub_document), sub_variables))
+        return kind, plan, order
+
+    def execute_local(self, sub_query: SubQuery, kind: str) -> dict:
+        """Answer __typename / __schema / __type without calling a service"""
+        if self.schema is None:
+            data, errors = {}, []
+            for field, key in zip(sub_query.fields, sub_query.response_keys):
+                if field.name.value == "__typename":
+                    data[key] = "Query" if kind == "query" else "Mutation"
+                else:
+                    data[key] = None
+                    errors.append({"message": "Schema introspection is not available yet", "path": [key]})
+            return {"data": data, "errors": errors} if errors else {"data": data}
+        result = execute(self.schema, parse(sub_query.query), variable_values=sub_query.variables)
+        response = {"data": result.data}
+        if result.errors:
+            response["errors"] = [error.formatted for error in result.errors]
+        return response
+
+
+# (service, sha256) pairs already sent to that service with their full text,
+# LRU bounded like the services' own persisted query stores
+_registered = OrderedDict()
+
+
+def _remember(registered_key):
+    _registered[registered_key] = True
+    _registered.move_to_end(registered_key)
+    if len(_registered) > settings.PERSISTED_QUERY_MAX_ENTRIES:
+        _registered.popitem(last=False)
+
+
+async def _post_sub_query(upstream, payload: dict, headers: dict, retry: bool, priority: int):
+    request = upstream.client.build_request(
+        "POST", upstream.url(GRAPHQL_PATH), json=payload, headers=headers
+    )
+    response = await upstream.send(request, retry=retry, priority=priority)
+    try:
+        content = await response.aread()
+    finally:
+        await upstream.release(response)
+    return response, content
+
+
+async def run_sub_query(upstream, sub_query: SubQuery, headers: dict, retry: bool = False,
+                        priority: int = LOW) -> dict:
+    # Sub-queries repeat a lot, send only the hash once the service knows the text
+    extensions = persisted_query_extensions(sub_query.query)
+    registered_key = (sub_query.service, extensions["persistedQuery"]["sha256Hash"])
+    full = {"query": sub_query.query, "variables": sub_query.variables, "extensions": extensions}
+    try:
+        payload = None
+        if registered_key in _registered:
+            _registered.move_to_end(registered_key)
+            response, content = await _post_sub_query(
+                upstream, {"variables": sub_query.variables, "extensions": extensions}, headers, retry, priority
+            )
+            payload = json.loads(content)
+            if is_persisted_query_not_found(payload):
+                # The service restarted or evicted it, teach it again
+                _registered.pop(registered_key, None)
+                payload = None
+        if payload is None:
+            response, content = await _post_sub_query(upstream, full, headers, retry, priority)
+            payload = json.loads(content)
+            if response.status_code == 200 and not is_persisted_query_not_found(payload):
+                _remember(registered_key)
+    except UPSTREAM_ERRORS as exc:
+        payload = None
+        message = f"Error connecting to {sub_query.service} service: {str(exc)}"
+    except ValueError:
+        payload = None
+        message = f"{sub_query.service} service responded with status {response.status_code}"
+    else:
+        message = f"{sub_query.service} service responded with status {response.status_code}"
+    if not isinstance(payload, dict) or ("data" not in payload and "errors" not in payload):
+        return {
+            "data": None,
+            "errors": [{"message": message, "path": [key]} for key in sub_query.response_keys],
+        }
+    return payload
+
+
+async def keep_schema_fresh(federation: FederatedSchema, upstreams: dict, interval: float):
+    """Retry introspection in the background until every upstream answered"""
+    while not federation.ready:
+        try:
+            await federation.refresh(upstreams)
+        except Exception as exc:
+            print(f"Federation: schema refresh failed ({exc})")
+        if not federation.ready:
+            await asyncio.sleep(interval)
+
+
+def merge_results(plan: List[SubQuery], results: List[dict], response_order: List[str]) -> dict:
+    data, errors = {}, []
+    for sub_query, result in zip(plan, results):
+        sub_data = result.get("data") or {}
+        for key in sub_query.response_keys:
+            data[key] = sub_data.get(key)
+        errors.extend(result.get("errors") or [])
+    ordered = {key: data.get(key) for key in response_order if key in data}
+    response = {"data": ordered}
+    if errors:
+        response["errors"] = errors
+    return response
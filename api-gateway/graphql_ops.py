@@ -0,0 +1,141 @@
+import hashlib
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from graphql import parse, print_ast, GraphQLError
+from graphql.language import OperationDefinitionNode, FieldNode
+
+from config import settings
+
+PERSISTED_QUERY_NOT_FOUND = {
+    "message": "PersistedQueryNotFound",
+    "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"},
+}
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def persisted_query_extensions(query: str) -> dict:
+    return {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}}
+
+
+def is_persisted_query_not_found(payload) -> bool:
+    if not isinstance(payload, dict):
+        return False
+    return any(
+        isinstance(error, dict) and error.get("message") == "PersistedQueryNotFound"
+        for error in payload.get("errors") or []
+    )
+
+
+class PersistedQueries:
+    """Automatic Persisted Queries: sha256 -> query text, LRU bounded.
+
+    Texts are learned from requests that carry both the query and its hash,
+    so later hash-only requests can still be cached, coalesced and planned.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._queries = OrderedDict()
+
+    def resolve(self, payload: dict) -> Tuple[Optional[str], Optional[dict]]:
+        """Returns (query, None), or (None, error) for a hash that can't be used"""
+        query = payload.get("query")
+        extensions = payload.get("extensions")
+        persisted = extensions.get("persistedQuery") if isinstance(extensions, dict) else None
+        if not isinstance(persisted, dict):
+            return query, None
+        sha256 = persisted.get("sha256Hash")
+        if persisted.get("version") != 1 or not isinstance(sha256, str):
+            return None, {"message": "Unsupported persisted query version"}
+
+        if isinstance(query, str) and query:
+            if query_hash(query) != sha256:
+                return None, {"message": "provided sha does not match query"}
+            self._queries[sha256] = query
+            if len(self._queries) > self.max_entries:
+                self._queries.popitem(last=False)
+            return query, None
+
+        query = self._queries.get(sha256)
+        if query is None:
+            return None, PERSISTED_QUERY_NOT_FOUND
+        self._queries.move_to_end(sha256)
+        return query, None
+
+
+persisted_queries = PersistedQueries(settings.PERSISTED_QUERY_MAX_ENTRIES)
+
+
+class Operation:
+    """What the gateway needs to know about one GraphQL request body"""
+
+    def __init__(self, operation_type: str, root_fields: List[str], normalized_query: str,
+                 variables: dict, operation_name: Optional[str] = None):
+        self.operation_type = operation_type
+        self.root_fields = root_fields
+        self.normalized_query = normalized_query
+        self.variables = variables or {}
+        self.operation_name = operation_name
+
+    @property
+    def is_query(self) -> bool:
+        return self.operation_type == "query"
+
+    @property
+    def is_mutation(self) -> bool:
+        return self.operation_type == "mutation"
+
+    def variables_key(self) -> str:
+        return json.dumps(self.variables, sort_keys=True, separators=(",", ":"))
+
+
+@lru_cache(maxsize=512)
+def _analyze(query: str, operation_name: Optional[str]):
+    document = parse(query)
+    operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+    if operation_name:
+        operations = [op for op in operations if op.name and op.name.value == operation_name]
+    if len(operations) != 1:
+        return None
+    operation = operations[0]
+    root_fields = [
+        selection.name.value
+        for selection in operation.selection_set.selections
+        if isinstance(selection, FieldNode)
+    ]
+    # print_ast drops comments and collapses whitespace differences
+    return operation.operation.value, tuple(root_fields), print_ast(document)
+
+
+def parse_operation(body: bytes) -> Optional[Operation]:
+    """Parse a JSON GraphQL request body, returns None when it is not one"""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    # Unknown hashes are passed through, the service asks the client for the text
+    query, error = persisted_queries.resolve(payload)
+    if error is not None or not isinstance(query, str):
+        return None
+    variables = payload.get("variables")
+    if variables is not None and not isinstance(variables, dict):
+        return None
+    operation_name = payload.get("operationName")
+    if operation_name is not None and not isinstance(operation_name, str):
+        return None
+    try:
+        analyzed = _analyze(query, operation_name)
+    except GraphQLError:
+        return None
+    if analyzed is None:
+        return None
+    operation_type, root_fields, normalized_query = analyzed
+    return Operation(operation_type, list(root_fields), normalized_query, variables, operation_name)
@@ -1,68 +1,464 @@
-import os
+import asyncio
+import hashlib
+import json
+import math
+import time
+from contextlib import asynccontextmanager
+
 import httpx
 from fastapi import FastAPI, Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from graphql import GraphQLError, parse
+from starlette.background import BackgroundTask
+from starlette.requests import ClientDisconnect
 
-app = FastAPI(title="EventHUB API Gateway")
+from auth import IDENTITY_HEADERS, claims_cache, get_identity, identity_headers
+from breaker import CircuitOpenError
+from cache import ResponseCache
+from capture import capture
+from concurrency import LOW, OverloadedError, classify
+from compression import choose_encoding, compress_body, compress_stream, encoded_headers, should_compress
+from config import settings, CACHE_CROSS_INVALIDATION
+from federation import FederatedSchema, keep_schema_fresh, merge_results, run_sub_query
+from graphiql_modern import MODERN_GRAPHIQL_HTML
+from graphql_ops import parse_operation, persisted_queries
+from metrics import metrics
+from proxy import filter_headers, raw_headers, iter_upstream_body, read_upstream_body, read_upstream_body_upto
+from ratelimit import check_rate_limit, limiters
+from singleflight import SingleFlight
+from upstreams import UPSTREAM_ERRORS, upstreams, open_upstreams, close_upstreams, watch_upstreams
 
-# Service URLs from environment variables
-BOOKING_SERVICE_URL = os.getenv("BOOKING_SERVICE_URL", "http://booking-service:8000")
-EVENT_SERVICE_URL = os.getenv("EVENT_SERVICE_URL", "http://event-service:8000")
-TICKET_SERVICE_URL = os.getenv("TICKET_SERVICE_URL", "http://ticket-service:8000")
-USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://user-service:8000")
 
-async def forward_request(url: str, request: Request) -> Response:
-    async with httpx.AsyncClient() as client:
-        method = request.method
-        content = await request.body()
-        headers = dict(request.headers)
-        # Remove host header to avoid confusion
-        headers.pop("host", None)
-        params = request.query_params
-        
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client per upstream, reused by every proxied request
+    open_upstreams()
+    schema_task = asyncio.create_task(
+        keep_schema_fresh(federation, upstreams, settings.FEDERATION_REFRESH_INTERVAL)
+    )
+    health_task = asyncio.create_task(watch_upstreams(settings.HEALTH_CHECK_INTERVAL))
+    capture_task = asyncio.create_task(capture.run()) if capture.enabled else None
+    yield
+    schema_task.cancel()
+    health_task.cancel()
+    if capture_task is not None:
+        capture_task.cancel()
+        await asyncio.gather(capture_task, return_exceptions=True)
+    await close_upstreams()
+
+app = FastAPI(title="EventHUB API Gateway", lifespan=lifespan)
+
+federation = FederatedSchema()
+single_flight = SingleFlight()
+
+response_cache = ResponseCache(
+    ttl=settings.RESPONSE_CACHE_TTL,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+)
+
+def auth_scope(request: Request) -> str:
+    # Responses may depend on the caller, so never share them across users
+    identity = get_identity(request)
+    if identity is not None:
+        return f"user:{identity.user_id}:{identity.role}"
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return "anonymous"
+    return hashlib.sha256(authorization.encode("utf-8")).hexdigest()
+
+def accepted_encoding(request: Request):
+    return choose_encoding(request.headers.get("accept-encoding"))
+
+def build_response(status_code: int, headers, body: bytes, encoding=None) -> Response:
+    if encoding and should_compress(headers, len(body)):
+        body = compress_body(body, encoding)
+        headers = encoded_headers(headers, encoding)
+    response = Response(content=body, status_code=status_code)
+    response.raw_headers = raw_headers(
+        [(name, value) for name, value in headers if name.lower() != "content-length"]
+    ) + [(b"content-length", str(len(body)).encode("latin-1"))]
+    return response
+
+async def wait_upstream(request: Request, awaitable):
+    # Accumulates the time this request spends waiting on upstream calls
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        request.state.upstream_seconds = (
+            getattr(request.state, "upstream_seconds", 0.0) + time.perf_counter() - started
+        )
+
+async def observed(route: str, request: Request, handler):
+    """Run a route handler while recording its latency split and status"""
+    metrics.route_in_flight[route] += 1
+    started = time.perf_counter()
+    status_code = 500
+    response = None
+    try:
+        response = await handler
+        status_code = response.status_code if isinstance(response, Response) else 200
+        return response
+    finally:
+        duration = time.perf_counter() - started
+        metrics.route_in_flight[route] -= 1
+        metrics.observe_route(
+            route, status_code, duration, getattr(request.state, "upstream_seconds", 0.0),
+        )
+        if capture.enabled:
+            await capture_request(route, request, response, status_code, duration)
+
+async def capture_request(route: str, request: Request, response, status_code: int, duration: float):
+    body = None
+    if "content-length" in request.headers or "transfer-encoding" in request.headers:
         try:
-            response = await client.request(
-                method,
-                url,
-                content=content,
-                headers=headers,
-                params=params,
-                timeout=10.0
-            )
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                headers=dict(response.headers)
-            )
-        except httpx.RequestError as exc:
-            return JSONResponse(
-                status_code=502,
-                content={"detail": f"Error connecting to service: {str(exc)}"}
+            # Only bodies the handler already buffered, streamed ones are gone
+            body = await request.body()
+        except (RuntimeError, ClientDisconnect):
+            body = None
+    length = response.headers.get("content-length") if isinstance(response, Response) else None
+    identity = get_identity(request)
+    capture.record(
+        route, request, body, status_code,
+        int(length) if length else None, duration,
+        (identity.role or "user") if identity is not None else None,
+    )
+
+async def send_upstream(upstream, path: str, request: Request, content, retry: bool = False,
+                        priority: int = LOW, drop=()) -> httpx.Response:
+    # Host is rewritten by httpx, hop-by-hop headers stay on this connection
+    headers = filter_headers(request.headers.items(), drop=["host", *IDENTITY_HEADERS, *drop])
+    if not any(name.lower() == "accept-encoding" for name, _ in headers):
+        # Bodies are relayed undecoded, don't let httpx advertise its own encodings
+        headers.append(("accept-encoding", "identity"))
+    headers.extend(identity_headers(get_identity(request)))
+    upstream_request = upstream.client.build_request(
+        request.method,
+        upstream.url(path),
+        content=content,
+        headers=headers,
+        params=request.query_params,
+    )
+    return await upstream.send(upstream_request, retry=retry, priority=priority)
+
+def upstream_error(exc: Exception) -> Response:
+    if isinstance(exc, OverloadedError):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Service overloaded: {str(exc)}"},
+            headers={"Retry-After": str(max(1, int(exc.retry_after + 0.5)))},
+        )
+    if isinstance(exc, CircuitOpenError):
+        # Fail fast instead of queueing behind a backend that is down
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Service temporarily unavailable: {str(exc)}"},
+            headers={"Retry-After": str(max(1, int(exc.retry_after + 0.5)))},
+        )
+    return JSONResponse(
+        status_code=502,
+        content={"detail": f"Error connecting to service: {str(exc)}"}
+    )
+
+async def forward_buffered(service: str, path: str, request: Request, body: bytes, retry: bool = False,
+                           stream_large: bool = True):
+    """Forward with the reply in memory, returns (status, headers, body, rest).
+
+    Replies over RESPONSE_CACHE_MAX_ENTRY_BYTES are not buffered: body is
+    None and rest relays the whole reply, or is None too when stream_large
+    is off and the reply was dropped.
+    """
+    upstream = upstreams[service]
+    # Buffered replies may be cached or shared with other clients, so ask for
+    # an unencoded body and compress per client in build_response
+    response = await send_upstream(
+        upstream, path, request, body or None, retry=retry, drop=["accept-encoding"]
+    )
+    content, rest = await read_upstream_body_upto(
+        response, upstream.release, settings.RESPONSE_CACHE_MAX_ENTRY_BYTES
+    )
+    if rest is not None and not stream_large:
+        await upstream.release(response)
+        rest = None
+    return response.status_code, filter_headers(response.headers.multi_items()), content, rest
+
+def invalidate_after_mutation(service: str, root_fields):
+    """Drops cached reads a mutation sent to service may have made stale"""
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return
+    response_cache.invalidate(service)
+    for field in root_fields:
+        for other in CACHE_CROSS_INVALIDATION.get(field, []):
+            response_cache.invalidate(other)
+
+async def forward_graphql(service: str, path: str, request: Request, body: bytes) -> Response:
+    operation = parse_operation(body)
+    if operation is None:
+        return await forward_request(service, path, request)
+
+    if not operation.is_query:
+        # Mutation replies are never cached, relay them like any other request
+        priority = classify(operation.operation_type, operation.root_fields)
+        try:
+            return await forward_request(service, path, request, priority=priority)
+        finally:
+            invalidate_after_mutation(service, operation.root_fields)
+
+    cacheable = settings.RESPONSE_CACHE_ENABLED and service in settings.RESPONSE_CACHE_ROUTES
+    coalesce = settings.COALESCE_ENABLED and service in settings.COALESCE_ROUTES
+    if not (cacheable or coalesce):
+        return await forward_request(service, path, request)
+
+    key = response_cache.make_key(service, path, operation, auth_scope(request))
+    if cacheable:
+        cached = response_cache.get(service, key)
+        if cached is not None:
+            response = build_response(
+                cached.status_code, cached.headers, cached.body, accepted_encoding(request)
             )
+            response.headers["X-Cache"] = "HIT"
+            return response
+        generation = response_cache.generation(service)
+
+    shared = False
+    try:
+        if coalesce:
+            # Identical queries already in flight wait for that call instead.
+            # A stream can't be shared, large replies are dropped and every
+            # waiter fetches its own copy below
+            flight_key = f"{key}:{response_cache.generation(service)}"
+            result, shared = await wait_upstream(request, single_flight.do(
+                flight_key, lambda: forward_buffered(service, path, request, body, retry=True, stream_large=False)
+            ))
+        else:
+            result = await wait_upstream(request, forward_buffered(service, path, request, body, retry=True))
+    except UPSTREAM_ERRORS as exc:
+        return upstream_error(exc)
+    status_code, headers, content, rest = result
+    if rest is not None:
+        return stream_response(request, status_code, headers, rest)
+    if content is None:
+        return await forward_request(service, path, request)
+
+    # GraphQL reports failures inside a 200, only keep clean results
+    if cacheable and not shared and status_code == 200 and b'"errors"' not in content:
+        response_cache.set(service, key, status_code, headers, content, generation)
+    response = build_response(status_code, headers, content, accepted_encoding(request))
+    if cacheable:
+        response.headers["X-Cache"] = "MISS"
+    if shared:
+        response.headers["X-Coalesced"] = "true"
+    return response
+
+async def forward_request(service: str, path: str, request: Request, priority: int = LOW) -> Response:
+    upstream = upstreams[service]
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    if not has_body:
+        content = None
+    elif settings.STREAM_PROXY:
+        content = request.stream()
+    else:
+        content = await request.body()
+
+    # Only bodiless reads can be replayed safely
+    retry = content is None and request.method in ("GET", "HEAD")
+    try:
+        response = await wait_upstream(
+            request, send_upstream(upstream, path, request, content, retry=retry, priority=priority)
+        )
+    except UPSTREAM_ERRORS as exc:
+        return upstream_error(exc)
+
+    headers = filter_headers(response.headers.multi_items())
+    if settings.STREAM_PROXY:
+        return stream_response(
+            request, response.status_code, headers, iter_upstream_body(response, upstream.release),
+            background=BackgroundTask(upstream.release, response),
+        )
+
+    try:
+        body = await wait_upstream(request, read_upstream_body(response, upstream.release))
+    except UPSTREAM_ERRORS as exc:
+        return upstream_error(exc)
+    return build_response(response.status_code, headers, body, accepted_encoding(request))
+
+def stream_response(request: Request, status_code: int, headers, body, background=None) -> StreamingResponse:
+    encoding = accepted_encoding(request)
+    length = next((value for name, value in headers if name.lower() == "content-length"), None)
+    if (
+        encoding
+        and request.method != "HEAD"
+        and status_code not in (204, 304)
+        and should_compress(headers, int(length) if length and length.isdigit() else None)
+    ):
+        body = compress_stream(body, encoding)
+        headers = encoded_headers(headers, encoding)
+    proxied = StreamingResponse(body, status_code=status_code, background=background)
+    proxied.raw_headers = raw_headers(headers)
+    return proxied
+
+def rate_limited(wait: float) -> Response:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Rate limit exceeded"},
+        headers={"Retry-After": str(max(1, math.ceil(wait)))},
+    )
+
+async def route_request(service: str, path: str, request: Request) -> Response:
+    return await observed(service, request, dispatch_request(service, path, request))
+
+async def dispatch_request(service: str, path: str, request: Request) -> Response:
+    wait = check_rate_limit(service, request)
+    if wait is not None:
+        return rate_limited(wait)
+
+    # POST bodies are inspected so mutations can invalidate the cache and
+    # get their priority class, as long as they are small enough to buffer
+    inspect = (
+        settings.RESPONSE_CACHE_ENABLED
+        or settings.COALESCE_ENABLED
+        or settings.CONCURRENCY_LIMIT_ENABLED
+    )
+    if request.method != "POST" or not inspect:
+        return await forward_request(service, path, request)
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) <= settings.GRAPHQL_INSPECT_MAX_BYTES:
+        return await forward_graphql(service, path, request, await request.body())
+    try:
+        return await forward_request(service, path, request)
+    finally:
+        # The body went through unparsed, it may have been a mutation
+        invalidate_after_mutation(service, CACHE_CROSS_INVALIDATION)
 
 @app.get("/health")
 async def health():
     return {"status": "ok", "service": "api-gateway"}
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(upstreams), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/breakers")
+async def breaker_stats():
+    return {
+        name: {**upstream.breaker.stats(), "retry_budget": upstream.retry_budget.stats()}
+        for name, upstream in upstreams.items()
+    }
+
+@app.get("/admin/concurrency")
+async def concurrency_stats():
+    return {name: upstream.limiter.stats() for name, upstream in upstreams.items()}
+
+@app.get("/admin/ratelimits")
+async def rate_limit_stats():
+    return {route: limiter.stats() for route, limiter in limiters.items()}
+
+@app.get("/admin/capture")
+async def capture_stats():
+    return capture.stats()
+
+@app.get("/admin/pools")
+async def pool_stats():
+    return {name: upstream.pool_stats() for name, upstream in upstreams.items()}
+
+@app.get("/admin/auth")
+async def auth_stats():
+    return claims_cache.stats()
+
+@app.get("/admin/cache")
+async def cache_stats():
+    return response_cache.stats()
+
+@app.get("/admin/coalescing")
+async def coalescing_stats():
+    return single_flight.stats()
+
+@app.get("/graphql", response_class=HTMLResponse)
+async def get_graphiql():
+    return MODERN_GRAPHIQL_HTML
+
+@app.post("/graphql")
+async def federated_graphql(request: Request):
+    return await observed("graphql", request, execute_federated(request))
+
+async def execute_federated(request: Request):
+    """Single endpoint over all services, root fields fan out in parallel"""
+    wait = check_rate_limit("graphql", request)
+    if wait is not None:
+        return rate_limited(wait)
+
+    try:
+        data = await request.json()
+    except Exception:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+
+    query, error = persisted_queries.resolve(data)
+    if error is not None:
+        return {"errors": [error]}
+    variables = data.get("variables") or {}
+
+    if not query:
+        return {"errors": [{"message": "No query provided"}]}
+
+    try:
+        kind, plan, order = federation.plan(parse(query), data.get("operationName"), variables)
+    except GraphQLError as exc:
+        return {"errors": [exc.formatted]}
+
+    # Each service's own limit applies too, /graphql must not be a way around it
+    for service in {sub_query.service for sub_query in plan if sub_query.service != "gateway"}:
+        wait = check_rate_limit(service, request)
+        if wait is not None:
+            return rate_limited(wait)
+
+    headers = {"Content-Type": "application/json"}
+    if "authorization" in request.headers:
+        headers["Authorization"] = request.headers["authorization"]
+    for name in settings.FEDERATION_FORWARD_HEADERS:
+        if name.lower() in request.headers:
+            headers[name] = request.headers[name.lower()]
+    headers.update(identity_headers(get_identity(request)))
+
+    async def run(sub_query):
+        if sub_query.service == "gateway":
+            return federation.execute_local(sub_query, kind)
+        root_fields = [field.name.value for field in sub_query.fields]
+        try:
+            return await run_sub_query(
+                upstreams[sub_query.service], sub_query, headers,
+                retry=kind == "query",
+                priority=classify(kind, root_fields),
+            )
+        finally:
+            if kind == "mutation":
+                invalidate_after_mutation(sub_query.service, root_fields)
+
+    if kind == "query":
+        results = await wait_upstream(request, asyncio.gather(*(run(sub_query) for sub_query in plan)))
+    else:
+        # Mutations must stay serial, one service after the other
+        results = [await wait_upstream(request, run(sub_query)) for sub_query in plan]
+    content = json.dumps(merge_results(plan, results, order)).encode("utf-8")
+    return build_response(200, [("content-type", "application/json")], content, accepted_encoding(request))
+
 @app.api_route("/booking/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def booking_proxy(path: str, request: Request):
-    url = f"{BOOKING_SERVICE_URL}/{path}"
-    return await forward_request(url, request)
+    return await route_request("booking", path, request)
 
 @app.api_route("/event/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def event_proxy(path: str, request: Request):
-    url = f"{EVENT_SERVICE_URL}/{path}"
-    return await forward_request(url, request)
+    return await route_request("event", path, request)
 
 @app.api_route("/ticket/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def ticket_proxy(path: str, request: Request):
-    url = f"{TICKET_SERVICE_URL}/{path}"
-    return await forward_request(url, request)
+    return await route_request("ticket", path, request)
 
 @app.api_route("/user/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 async def user_proxy(path: str, request: Request):
-    url = f"{USER_SERVICE_URL}/{path}"
-    return await forward_request(url, request)
+    return await route_request("user", path, request)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,109 @@
+from bisect import bisect_left
+from collections import defaultdict
+
+# Seconds, chosen around the services' typical 5ms-1s GraphQL calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        # Per-bucket counts, made cumulative only when scraped
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    """Counters and histograms for the Prometheus /metrics endpoint.
+
+    Everything is updated from the event loop thread, so recording is a
+    few dict lookups and integer increments with no locking.
+    """
+
+    def __init__(self):
+        self.route_requests = defaultdict(int)        # (route, status class)
+        self.route_in_flight = defaultdict(int)       # route
+        self.route_duration = defaultdict(Histogram)  # route
+        self.route_upstream = defaultdict(Histogram)  # route, time spent waiting on upstreams
+        self.route_overhead = defaultdict(Histogram)  # route, the rest
+        self.upstream_requests = defaultdict(int)     # (upstream, status class or "error")
+        self.upstream_duration = defaultdict(Histogram)  # upstream, time to response headers
+
+    def observe_route(self, route: str, status_code: int, duration: float, upstream_time: float):
+        self.route_requests[(route, status_class(status_code))] += 1
+        self.route_duration[route].observe(duration)
+        self.route_upstream[route].observe(upstream_time)
+        self.route_overhead[route].observe(max(0.0, duration - upstream_time))
+
+    def observe_upstream(self, upstream: str, status_code, duration: float):
+        outcome = status_class(status_code) if status_code is not None else "error"
+        self.upstream_requests[(upstream, outcome)] += 1
+        self.upstream_duration[upstream].observe(duration)
+
+    def render(self, upstreams: dict) -> str:
+        lines = []
+        _counter(lines, "gateway_requests_total", "Requests handled per route and status class",
+                 ("route", "status"), self.route_requests)
+        _gauge(lines, "gateway_requests_in_flight", "Requests currently being handled per route",
+               "route", self.route_in_flight)
+        _histogram(lines, "gateway_request_duration_seconds", "Time until the response headers were ready",
+                   "route", self.route_duration)
+        _histogram(lines, "gateway_upstream_wait_seconds", "Part of the request time spent waiting on upstreams",
+                   "route", self.route_upstream)
+        _histogram(lines, "gateway_overhead_seconds", "Part of the request time spent in the gateway itself",
+                   "route", self.route_overhead)
+        _counter(lines, "upstream_requests_total", "Calls per upstream and status class, retries included",
+                 ("upstream", "status"), self.upstream_requests)
+        _gauge(lines, "upstream_requests_in_flight", "Upstream calls whose response is not released yet",
+               "upstream", {name: upstream.in_flight for name, upstream in upstreams.items()})
+        _gauge(lines, "upstream_concurrency_limit", "Current adaptive concurrency limit",
+               "upstream", {name: upstream.limiter.limit for name, upstream in upstreams.items()})
+        _histogram(lines, "upstream_request_duration_seconds", "Upstream time to response headers",
+                   "upstream", self.upstream_duration)
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names, values) -> str:
+    if isinstance(names, str):
+        names, values = (names,), (values,)
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _counter(lines, name, help_text, label_names, values):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for key, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(label_names, key)} {value}")
+
+
+def _gauge(lines, name, help_text, label_name, values):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} gauge")
+    for key, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(label_name, key)} {value:g}")
+
+
+def _histogram(lines, name, help_text, label_name, histograms):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f'{name}_bucket{{{label_name}="{key}",le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum{_labels(label_name, key)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{_labels(label_name, key)} {cumulative}")
+
+
+metrics = Metrics()
@@ -0,0 +1,84 @@
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+import httpx
+
+# Headers that only apply to a single transport-level connection (RFC 7230 6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+def filter_headers(headers: Iterable[Tuple[str, str]], drop: Iterable[str] = ()) -> List[Tuple[str, str]]:
+    """Strip hop-by-hop headers, including any listed in the Connection header"""
+    headers = list(headers)
+    excluded = set(HOP_BY_HOP_HEADERS)
+    excluded.update(name.lower() for name in drop)
+    for name, value in headers:
+        if name.lower() == "connection":
+            excluded.update(token.strip().lower() for token in value.split(",") if token.strip())
+    return [(name, value) for name, value in headers if name.lower() not in excluded]
+
+
+def raw_headers(headers: Iterable[Tuple[str, str]]) -> List[Tuple[bytes, bytes]]:
+    # Kept as a list so repeated headers like Set-Cookie survive the proxy
+    return [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+
+async def iter_upstream_body(response: httpx.Response, release) -> AsyncIterator[bytes]:
+    """Relay the upstream body chunk by chunk, without decoding content-encoding"""
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+    finally:
+        await release(response)
+
+
+async def read_upstream_body(response: httpx.Response, release) -> bytes:
+    chunks = [chunk async for chunk in iter_upstream_body(response, release)]
+    return b"".join(chunks)
+
+
+async def read_upstream_body_upto(
+    response: httpx.Response, release, limit: int
+) -> Tuple[Optional[bytes], Optional[AsyncIterator[bytes]]]:
+    """(body, None) when the body fits in limit bytes, else (None, iterator).
+
+    Reading stops at the first chunk past limit. The iterator relays the
+    whole body like iter_upstream_body; call release to drop it instead.
+    """
+    raw = response.aiter_raw()
+    chunks, size = [], 0
+    length = response.headers.get("content-length")
+    if length is None or not length.isdigit() or int(length) <= limit:
+        try:
+            async for chunk in raw:
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > limit:
+                    break
+            else:
+                await release(response)
+                return b"".join(chunks), None
+        except BaseException:
+            await release(response)
+            raise
+    return None, _relay_rest(response, release, chunks, raw)
+
+
+async def _relay_rest(response: httpx.Response, release, head: List[bytes], raw) -> AsyncIterator[bytes]:
+    try:
+        for chunk in head:
+            yield chunk
+        async for chunk in raw:
+            yield chunk
+    finally:
+        await release(response)
@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from auth import get_identity
+from config import settings
+
+
+class TokenBucketLimiter:
+    """Token bucket per client key, spread over shards by key hash.
+
+    Each shard is a small LRU bounded to its share of max_keys, so idle
+    clients are forgotten without a sweeper. A bucket is just
+    [tokens, last_refill]; everything runs on the event loop, so no locks.
+    """
+
+    def __init__(self, rate: float, burst: float, shards: int, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self._shards = [OrderedDict() for _ in range(max(1, shards))]
+        self._max_per_shard = max(1, max_keys // len(self._shards))
+        self.allowed = 0
+        self.limited = 0
+
+    def take(self, key: str) -> float:
+        """Spend one token, returns 0 when allowed or seconds until the next token"""
+        now = time.monotonic()
+        shard = self._shards[hash(key) % len(self._shards)]
+        bucket = shard.get(key)
+        if bucket is None:
+            bucket = [self.burst, now]
+            shard[key] = bucket
+            if len(shard) > self._max_per_shard:
+                shard.popitem(last=False)
+        else:
+            shard.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            self.allowed += 1
+            return 0.0
+        self.limited += 1
+        return (1.0 - bucket[0]) / self.rate
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tracked_clients": sum(len(shard) for shard in self._shards),
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
+
+
+limiters = {
+    route: TokenBucketLimiter(rate, burst, settings.RATE_LIMIT_SHARDS, settings.RATE_LIMIT_MAX_KEYS)
+    for route, (rate, burst) in settings.RATE_LIMITS.items()
+    if rate > 0
+}
+
+
+def client_key(request) -> str:
+    # Verified users get their own bucket wherever they connect from
+    identity = get_identity(request)
+    if identity is not None:
+        return f"user:{identity.user_id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def check_rate_limit(route: str, request) -> Optional[float]:
+    """Seconds the caller must wait, or None when the request may proceed"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    limiter = limiters.get(route)
+    if limiter is None:
+        return None
+    wait = limiter.take(client_key(request))
+    return wait or None
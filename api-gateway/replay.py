@@ -0,0 +1,155 @@
+"""Replay a gateway capture file against a running stack, time-scaled.
+
+Requests are fired open-loop at their captured offsets divided by --speed,
+so a slow stack builds a backlog instead of quietly lowering the load.
+
+    CAPTURE_FILE=capture.jsonl uvicorn main:app ...    # record
+    python replay.py capture.jsonl --speed 5 --token "$TOKEN"
+    python replay.py capture.jsonl --token ADMIN="$ADMIN" --token USER="$U1" --token USER="$U2"
+
+The gateway rate-limits per user, so a replay faster than the capture
+needs a pool of tokens per role (used round-robin) or a gateway running
+with RATE_LIMIT_ENABLED=false. 429s are reported apart from 5xx errors.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import defaultdict
+
+import httpx
+
+
+def load(path: str):
+    records = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    records.sort(key=lambda record: record["t"])
+    return records
+
+
+def label(record: dict) -> str:
+    return f"{record['route']} {record.get('op') or record['method'] + ' ' + record['path']}"
+
+
+def parse_tokens(values):
+    """{role: [tokens]} from --token TOKEN (any role) and --token ROLE=TOKEN"""
+    pools = defaultdict(list)
+    for value in values:
+        # JWTs are base64url without padding, they never contain "="
+        role, sep, token = value.partition("=")
+        if not sep:
+            role, token = "", value
+        pools[role.lower()].append(token)
+    return dict(pools)
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+async def replay(records, target: str, speed: float, tokens: dict, max_in_flight: int, timeout: float):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    throttled = defaultdict(int)
+    semaphore = asyncio.Semaphore(max_in_flight)
+    pools = {role: itertools.cycle(pool) for role, pool in tokens.items()}
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        async def send(record):
+            name = label(record)
+            url = record["path"] + (f"?{record['qs']}" if record.get("qs") else "")
+            body = record.get("body")
+            request_headers = {}
+            # Anonymous traffic stays anonymous
+            if record.get("auth"):
+                pool = pools.get(record["auth"].lower()) or pools.get("")
+                if pool is not None:
+                    request_headers["Authorization"] = f"Bearer {next(pool)}"
+            async with semaphore:
+                started = time.perf_counter()
+                status_code = None
+                try:
+                    response = await client.request(
+                        record["method"], url, json=body if body is not None else None, headers=request_headers
+                    )
+                    status_code = response.status_code
+                except httpx.HTTPError:
+                    pass
+                latencies[name].append(time.perf_counter() - started)
+                if status_code == 429:
+                    throttled[name] += 1
+                elif status_code is None or status_code >= 500:
+                    errors[name] += 1
+
+        start_at = records[0]["t"]
+        began = time.perf_counter()
+        tasks = []
+        for record in records:
+            delay = (record["t"] - start_at) / speed - (time.perf_counter() - began)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(send(record)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - began
+    return latencies, errors, throttled, elapsed
+
+
+def report(latencies, errors, throttled, elapsed: float, captured_seconds: float, speed: float):
+    total = sum(len(values) for values in latencies.values())
+    print(
+        f"{total} requests in {elapsed:.2f}s at {speed:g}x "
+        f"(captured span {captured_seconds:.2f}s): {total / elapsed if elapsed else 0:.1f} req/s"
+    )
+    header = f"{'operation':<48} {'count':>6} {'5xx':>6} {'429':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for name in sorted(latencies, key=lambda key: -len(latencies[key])):
+        values = sorted(latencies[name])
+        print(
+            f"{name[:48]:<48} {len(values):>6} {errors[name]:>6} {throttled[name]:>6} "
+            f"{percentile(values, 0.50) * 1000:>8.1f} {percentile(values, 0.95) * 1000:>8.1f} "
+            f"{percentile(values, 0.99) * 1000:>8.1f} {values[-1] * 1000:>8.1f}"
+        )
+    rate_limited = sum(throttled.values())
+    if rate_limited:
+        print(
+            f"\n{rate_limited} requests were rate limited (429): pass more --token values per role "
+            "or run the gateway with RATE_LIMIT_ENABLED=false"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="JSON lines file written with CAPTURE_FILE")
+    parser.add_argument("--target", default="http://localhost:8090")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale, e.g. 1, 5 or 20")
+    parser.add_argument(
+        "--token", action="append", default=[],
+        help="bearer token for requests captured as authenticated, TOKEN for any role or ROLE=TOKEN; "
+             "repeat to build a round-robin pool per role",
+    )
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    records = load(args.capture)
+    if not records:
+        print("Capture file is empty")
+        return
+    latencies, errors, throttled, elapsed = asyncio.run(
+        replay(records, args.target, args.speed, parse_tokens(args.token), args.max_in_flight, args.timeout)
+    )
+    report(latencies, errors, throttled, elapsed, records[-1]["t"] - records[0]["t"], args.speed)
+
+
+if __name__ == "__main__":
+    main()
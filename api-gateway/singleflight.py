@@ -0,0 +1,39 @@
+import asyncio
+from typing import Awaitable, Callable, Tuple
+
+
+class SingleFlight:
+    """Lets concurrent identical requests share one upstream call"""
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]) -> Tuple[object, bool]:
+        """Run fn once per key at a time, returns (result, shared)"""
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            # Own task, so a waiter that disconnects doesn't cancel the others
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: str, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "upstream_calls": self.leaders,
+            "coalesced_requests": self.followers,
+        }
@@ -0,0 +1,244 @@
+import asyncio
+import time
+from typing import List
+
+import httpx
+
+from balancer import Balancer, Instance
+from breaker import CircuitBreaker, CircuitOpenError, RetryBudget
+from concurrency import LOW, AdaptiveLimiter, OverloadedError
+from config import settings, UPSTREAM_URLS
+from metrics import metrics
+
+# Errors that mean "the upstream could not answer", handled the same way
+UPSTREAM_ERRORS = (httpx.RequestError, CircuitOpenError, OverloadedError)
+
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+class Upstream:
+    """Long-lived, pooled HTTP client for one backend service and its replicas"""
+
+    def __init__(self, name: str, base_urls: List[str]):
+        self.name = name
+        self.instances = [Instance(base_url) for base_url in base_urls]
+        self.balancer = Balancer(
+            self.instances,
+            strategy=settings.LOAD_BALANCER,
+            consecutive_failures=settings.OUTLIER_CONSECUTIVE_FAILURES,
+            ejection_seconds=settings.OUTLIER_EJECTION_SECONDS,
+            max_ejection_percent=settings.OUTLIER_MAX_EJECTION_PERCENT,
+        )
+        # Pool and concurrency limits are per replica, the client is shared
+        replicas = len(self.instances)
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_MAX_CONNECTIONS * replicas,
+                max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE * replicas,
+                keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.upstream_timeout(name),
+                connect=settings.UPSTREAM_CONNECT_TIMEOUT,
+            ),
+            http2=settings.UPSTREAM_HTTP2,
+        )
+        self.breaker = CircuitBreaker(
+            failure_rate=settings.BREAKER_FAILURE_RATE,
+            slow_call_rate=settings.BREAKER_SLOW_CALL_RATE,
+            slow_call_seconds=settings.BREAKER_SLOW_CALL_SECONDS,
+            min_requests=settings.BREAKER_MIN_REQUESTS,
+            window_seconds=settings.BREAKER_WINDOW_SECONDS,
+            open_seconds=settings.BREAKER_OPEN_SECONDS,
+            half_open_probes=settings.BREAKER_HALF_OPEN_PROBES,
+        )
+        self.retry_budget = RetryBudget(
+            ratio=settings.RETRY_BUDGET_RATIO,
+            min_per_second=settings.RETRY_MIN_PER_SECOND,
+        )
+        self.limiter = AdaptiveLimiter(
+            name,
+            initial=(settings.CONCURRENCY_INITIAL_LIMIT or settings.UPSTREAM_MAX_CONNECTIONS) * replicas,
+            min_limit=settings.CONCURRENCY_MIN_LIMIT,
+            max_limit=settings.CONCURRENCY_MAX_LIMIT * replicas,
+            tolerance=settings.CONCURRENCY_LATENCY_TOLERANCE,
+            backoff=settings.CONCURRENCY_BACKOFF,
+        )
+        # Responses counted in in_flight (with their replica) / holding a
+        # concurrency slot until released
+        self._open = {}
+        self._permits = set()
+        self.in_flight = 0
+        self.total_requests = 0
+
+    def url(self, path: str) -> str:
+        # send() may still move the request to another replica
+        return f"{self.balancer.pick().base_url}/{path}"
+
+    async def send(self, request: httpx.Request, retry: bool = False, priority: int = LOW) -> httpx.Response:
+        """Send a request and return as soon as the upstream headers arrive.
+
+        retry must only be set for idempotent requests with a replayable
+        body; those are retried on connection errors and 502/503/504 while
+        the retry budget allows it. The concurrency slot taken for the
+        request is held until release() is called for the response.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+        limited = settings.CONCURRENCY_LIMIT_ENABLED
+        if limited:
+            try:
+                await self.limiter.acquire(priority)
+            except BaseException:
+                self.breaker.abandon()
+                raise
+        try:
+            response = await self._send(request, retry)
+        except BaseException:
+            if limited:
+                self.limiter.release()
+            raise
+        if limited:
+            self._permits.add(id(response))
+        return response
+
+    async def _send(self, request: httpx.Request, retry: bool) -> httpx.Response:
+        self.retry_budget.deposit()
+        attempt = 0
+        instance = None
+        while True:
+            if attempt and not self.breaker.allow():
+                raise CircuitOpenError(self.name, self.breaker.retry_after())
+            # Retries go to a different replica when there is one
+            instance = self.balancer.pick(exclude=instance)
+            self._route(request, instance)
+            self._start(instance)
+            started = time.monotonic()
+            try:
+                response = await self.client.send(request, stream=True)
+            except BaseException as exc:
+                self._finish(instance)
+                if isinstance(exc, httpx.RequestError):
+                    self._record(instance, None, time.monotonic() - started)
+                    if self._should_retry(retry, attempt, exc):
+                        attempt += 1
+                        continue
+                else:
+                    self.breaker.abandon()
+                raise
+            self._record(instance, response.status_code, time.monotonic() - started)
+            if response.status_code in RETRYABLE_STATUS and self._should_retry(retry, attempt):
+                await response.aclose()
+                self._finish(instance)
+                attempt += 1
+                continue
+            self._open[id(response)] = instance
+            return response
+
+    @staticmethod
+    def _route(request: httpx.Request, instance: Instance):
+        # Replicas only differ in scheme, host and port
+        request.url = request.url.copy_with(scheme=instance.scheme, host=instance.host, port=instance.port)
+        request.headers["Host"] = instance.netloc
+
+    def _start(self, instance: Instance):
+        self.in_flight += 1
+        self.total_requests += 1
+        instance.outstanding += 1
+        instance.total_requests += 1
+
+    def _finish(self, instance: Instance):
+        self.in_flight -= 1
+        instance.outstanding -= 1
+
+    def _record(self, instance: Instance, status_code, latency: float):
+        # status_code is None when no response arrived at all
+        success = status_code is not None and status_code < 500
+        metrics.observe_upstream(self.name, status_code, latency)
+        self.balancer.record(instance, success)
+        self.breaker.record(success, latency)
+        if settings.CONCURRENCY_LIMIT_ENABLED:
+            self.limiter.record(latency, success)
+
+    def _should_retry(self, retry: bool, attempt: int, exc: Exception = None) -> bool:
+        if not retry or attempt >= settings.RETRY_MAX_ATTEMPTS:
+            return False
+        # A timed out read may still have been processed, don't pile on
+        if isinstance(exc, httpx.ReadTimeout):
+            return False
+        return self.retry_budget.withdraw()
+
+    async def release(self, response: httpx.Response):
+        # Safe to call more than once, the connection goes back to the pool.
+        # httpx closes a fully read stream itself, so count by identity
+        if not response.is_closed:
+            await response.aclose()
+        instance = self._open.pop(id(response), None)
+        if instance is not None:
+            self._finish(instance)
+        if id(response) in self._permits:
+            self._permits.discard(id(response))
+            self.limiter.release()
+
+    def pool_stats(self) -> dict:
+        connections = []
+        # httpx does not expose pool state publicly, read it from the transport
+        pool = getattr(getattr(self.client, "_transport", None), "_pool", None)
+        if pool is not None:
+            connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "instances": [instance.stats() for instance in self.instances],
+            "http2": settings.UPSTREAM_HTTP2,
+            "connections": len(connections),
+            "active_connections": len(connections) - idle,
+            "idle_connections": idle,
+            "max_connections": settings.UPSTREAM_MAX_CONNECTIONS * len(self.instances),
+            "max_keepalive": settings.UPSTREAM_MAX_KEEPALIVE * len(self.instances),
+            "in_flight": self.in_flight,
+            "total_requests": self.total_requests,
+        }
+
+    async def check_health(self):
+        """Active check of every replica, a cheap GraphQL query each"""
+        async def check(instance: Instance):
+            try:
+                response = await self.client.post(
+                    f"{instance.base_url}/graphql",
+                    json={"query": "{ __typename }"},
+                    headers={"accept-encoding": "identity"},
+                    timeout=settings.HEALTH_CHECK_TIMEOUT,
+                )
+                ok = response.status_code < 500
+            except httpx.HTTPError:
+                ok = False
+            self.balancer.record_check(instance, ok, settings.HEALTH_CHECK_THRESHOLD)
+
+        await asyncio.gather(*(check(instance) for instance in self.instances))
+
+    async def close(self):
+        await self.client.aclose()
+
+
+upstreams = {}
+
+
+def open_upstreams():
+    for name, urls in UPSTREAM_URLS.items():
+        base_urls = [url.strip() for url in urls.split(",") if url.strip()]
+        upstreams[name] = Upstream(name, base_urls)
+
+
+async def watch_upstreams(interval: float):
+    """Health-check replicas in the background, single-instance upstreams are skipped"""
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.gather(
+            *(upstream.check_health() for upstream in upstreams.values() if len(upstream.instances) > 1)
+        )
+
+
+async def close_upstreams():
+    for upstream in upstreams.values():
+        await upstream.close()
+    upstreams.clear()
@@ -5,11 +5,46 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./bookings.db")
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", 65536))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
     SECRET_KEY: str = os.getenv("SECRET_KEY", "supersecretkey")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
     JWT_SECRET_KEY: str = os.getenv('JWT_SECRET_KEY', 'dev-secret-123')
     TICKET_SERVICE_URL: str = os.getenv('TICKET_SERVICE_URL', 'http://localhost:4002/graphql')
     EVENT_SERVICE_URL: str = os.getenv("EVENT_SERVICE_URL", "http://localhost:4001/graphql")
+    GATEWAY_SHARED_SECRET: str = os.getenv("GATEWAY_SHARED_SECRET", "")
+    PERSISTED_QUERY_MAX_ENTRIES: int = int(os.getenv("PERSISTED_QUERY_MAX_ENTRIES", 1000))
+    DOCUMENT_CACHE_MAX_ENTRIES: int = int(os.getenv("DOCUMENT_CACHE_MAX_ENTRIES", 1000))
+    HTTP_CLIENT_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_TIMEOUT", 5))
+    HTTP_CLIENT_MAX_CONNECTIONS: int = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", 200))
+    HTTP_CLIENT_MAX_KEEPALIVE: int = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", 50))
+    CATALOG_CACHE_ENABLED: bool = os.getenv("CATALOG_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    EVENT_CACHE_TTL: float = float(os.getenv("EVENT_CACHE_TTL", 30))
+    TICKET_CACHE_TTL: float = float(os.getenv("TICKET_CACHE_TTL", 5))
+    CATALOG_CACHE_STALE_TTL: float = float(os.getenv("CATALOG_CACHE_STALE_TTL", 30))
+    CATALOG_CACHE_MAX_ENTRIES: int = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", 1000))
+    BOOKING_WRITE_BATCHING: bool = os.getenv("BOOKING_WRITE_BATCHING", "true").lower() in ("1", "true", "yes")
+    BOOKING_WRITE_BATCH_SIZE: int = int(os.getenv("BOOKING_WRITE_BATCH_SIZE", 100))
+    BOOKING_WRITE_MAX_DELAY_MS: float = float(os.getenv("BOOKING_WRITE_MAX_DELAY_MS", 2))
+    IDEMPOTENCY_TTL_HOURS: float = float(os.getenv("IDEMPOTENCY_TTL_HOURS", 24))
+    IDEMPOTENCY_LEASE_SECONDS: float = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", 60))
+    IDEMPOTENCY_WAIT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 10))
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", 50))
+    OUTBOX_POLL_INTERVAL: float = float(os.getenv("OUTBOX_POLL_INTERVAL", 1.0))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 10))
+    BOOKING_HOLD_MINUTES: float = float(os.getenv("BOOKING_HOLD_MINUTES", 15))
+    BOOKING_SWEEP_ENABLED: bool = os.getenv("BOOKING_SWEEP_ENABLED", "true").lower() in ("1", "true", "yes")
+    BOOKING_SWEEP_INTERVAL: float = float(os.getenv("BOOKING_SWEEP_INTERVAL", 60))
+    BOOKING_SWEEP_BATCH_SIZE: int = int(os.getenv("BOOKING_SWEEP_BATCH_SIZE", 500))
+    BOOKINGS_PAGE_SIZE: int = int(os.getenv("BOOKINGS_PAGE_SIZE", 20))
+    BOOKINGS_PAGE_MAX: int = int(os.getenv("BOOKINGS_PAGE_MAX", 100))
 
 settings = Settings()
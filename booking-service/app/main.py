@@ -1,20 +1,42 @@
+from inspect import isawaitable
 from fastapi import FastAPI, Depends, Request
+from graphql import execute
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import engine, Base, get_db
+from app.migrations import upgrade_schema
+from app.models.outbox import QuotaOutbox
 from app.schema.schema import schema
-from app.auth import get_user_from_token
+from app.schema.booking_schema import create_loaders
+from app.auth import get_user_from_token, get_user_from_gateway, is_internal_request
 from contextlib import asynccontextmanager
 from app.graphiql_modern import MODERN_GRAPHIQL_HTML
+from app.persisted_queries import resolve_query, document_cache
+from app.services.http_client import get_client, close_client
+from app.services.catalog_cache import event_cache, ticket_cache
+from app.services.booking_writer import booking_writer
+from app.services.quota_outbox import quota_outbox
+from app.services.booking_sweeper import booking_sweeper
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+    # Built up front, creating the SSL context would stall the first booking
+    get_client()
+    booking_writer.start()
+    quota_outbox.start()
+    booking_sweeper.start()
     yield
+    await booking_sweeper.stop()
+    await quota_outbox.stop()
+    await booking_writer.stop()
+    await close_client()
 
 app = FastAPI(lifespan=lifespan)
 
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 
 @app.get("/graphql", response_class=HTMLResponse)
 async def get_graphiql():
@@ -27,7 +49,9 @@ async def graphql_handler(request: Request, db: AsyncSession = Depends(get_db)):
     except Exception:
         data = {}
         
-    query = data.get("query")
+    query, error = resolve_query(data)
+    if error is not None:
+        return error
     variables = data.get("variables")
     
     if not query:
@@ -37,26 +61,36 @@ async def graphql_handler(request: Request, db: AsyncSession = Depends(get_db)):
     user_id = None
     user_role = None
     
-    if auth_header and auth_header.startswith("Bearer "):
+    user_data = get_user_from_gateway(request.headers)
+    if user_data is None and auth_header and auth_header.startswith("Bearer "):
         token = auth_header.split(" ")[1]
         user_data = get_user_from_token(token)
-        if user_data:
-            user_id = user_data[0]
-            payload = user_data[1]
-            user_role = payload.get("role")
+    if user_data:
+        user_id = user_data[0]
+        payload = user_data[1]
+        user_role = payload.get("role")
             
     context = {
         "db": db,
         "user_id": user_id,
         "user_role": user_role,
         "request": request,
+        "loaders": create_loaders(),
     }
     
-    result = await schema.execute_async(
-        query,
+    # Same as schema.execute_async, minus parsing and validating known documents
+    document, errors = document_cache.get(schema.graphql_schema, query)
+    if errors:
+        return {"errors": [{"message": str(e)} for e in errors]}
+    result = execute(
+        schema.graphql_schema,
+        document,
         variable_values=variables,
         context_value=context,
+        operation_name=data.get("operationName"),
     )
+    if isawaitable(result):
+        result = await result
     
     response = {}
     if result.errors:
@@ -66,6 +100,71 @@ async def graphql_handler(request: Request, db: AsyncSession = Depends(get_db)):
         
     return response
 
+@app.post("/internal/cache/invalidate")
+async def invalidate_catalog_cache(request: Request):
+    """Called by event/ticket service when an event or its ticket types change"""
+    if not is_internal_request(request.headers):
+        return JSONResponse(status_code=403, content={"detail": "Forbidden"})
+    try:
+        data = await request.json()
+    except Exception:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    event_id = data.get("event_id")
+    event_id = str(event_id) if event_id is not None else None
+    scope = data.get("scope")
+    if scope in (None, "event"):
+        event_cache.invalidate(event_id)
+    if scope in (None, "tickets"):
+        ticket_cache.invalidate(event_id)
+    return {"invalidated": True, "event_id": event_id, "scope": scope or "all"}
+
+@app.get("/internal/cache")
+async def catalog_cache_stats():
+    return {"event": event_cache.stats(), "ticket": ticket_cache.stats()}
+
+@app.get("/internal/documents")
+async def document_cache_stats():
+    return document_cache.stats()
+
+@app.get("/internal/writer")
+async def booking_writer_stats():
+    return booking_writer.stats()
+
+@app.get("/internal/outbox")
+async def quota_outbox_stats(db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(QuotaOutbox.status, func.count()).group_by(QuotaOutbox.status))
+    rows = dict(result.all())
+    result = await db.execute(
+        select(QuotaOutbox).where(QuotaOutbox.status == "FAILED").order_by(QuotaOutbox.id).limit(100)
+    )
+    failed = [
+        {
+            "booking_id": row.booking_id,
+            "ticket_type_id": row.ticket_type_id,
+            "quantity": row.quantity,
+            "attempts": row.attempts,
+            "last_error": row.last_error,
+            "created_at": row.created_at,
+        }
+        for row in result.scalars()
+    ]
+    return {**quota_outbox.stats(), "rows": rows, "failed_rows": failed}
+
+@app.post("/internal/outbox/{booking_id}/retry")
+async def retry_quota_commit(booking_id: int, request: Request):
+    """Sends a FAILED quota commit to Ticket Service again"""
+    if not is_internal_request(request.headers):
+        return JSONResponse(status_code=403, content={"detail": "Forbidden"})
+    if not await quota_outbox.requeue(booking_id):
+        return JSONResponse(status_code=404, content={"detail": "No FAILED quota commit for this booking"})
+    return {"requeued": True, "booking_id": booking_id}
+
+@app.get("/internal/sweeper")
+async def booking_sweeper_stats():
+    return booking_sweeper.stats()
+
 @app.get("/")
 def read_root():
     return {"message": "Booking Service is running"}
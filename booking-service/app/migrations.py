@@ -0,0 +1,42 @@
+from sqlalchemy import inspect, text
+
+from app.models.booking import Booking
+from app.models.idempotency import IdempotencyKey
+
+# Indexes added to bookings after the first release
+BOOKING_INDEXES = ("ix_bookings_status_created_at", "ix_bookings_user_status_id")
+
+
+def upgrade_schema(connection):
+    """Brings tables created by an older version up to date.
+
+    create_all only creates missing tables, it never alters existing ones.
+    Safe to run on every startup: each step checks first.
+    """
+    inspector = inspect(connection)
+    if inspector.has_table("idempotency_keys"):
+        columns = {column["name"]: column for column in inspector.get_columns("idempotency_keys")}
+        if not columns["booking_id"]["nullable"]:
+            # Keys only live for IDEMPOTENCY_TTL_HOURS, recreating the table
+            # is simpler than SQLite's table rebuild to drop NOT NULL
+            IdempotencyKey.__table__.drop(connection)
+            IdempotencyKey.__table__.create(connection)
+
+    if not inspector.has_table("bookings"):
+        return
+
+    columns = {column["name"] for column in inspector.get_columns("bookings")}
+    if "created_at" not in columns:
+        if connection.dialect.name == "sqlite":
+            # SQLite can't add a column with a non-constant default, fill it afterwards
+            connection.execute(text("ALTER TABLE bookings ADD COLUMN created_at DATETIME"))
+            connection.execute(text("UPDATE bookings SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL"))
+        else:
+            connection.execute(text(
+                "ALTER TABLE bookings ADD COLUMN created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP"
+            ))
+
+    existing = {index["name"] for index in inspector.get_indexes("bookings")}
+    for index in Booking.__table__.indexes:
+        if index.name in BOOKING_INDEXES and index.name not in existing:
+            index.create(connection)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Enum as sqlEnum
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, Enum as sqlEnum
 import enum
 from app.database import Base
 
@@ -9,11 +10,19 @@ class PaymentStatus(enum.Enum):
 
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # The sweeper looks up PENDING bookings past their hold by this index
+        Index("ix_bookings_status_created_at", "status", "created_at"),
+        # Keyset pagination of bookingsByUser, with or without a status filter
+        Index("ix_bookings_user_status_id", "user_id", "status", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    event_id = Column(String, index=True, nullable=False)
-    user_id = Column(String, index=True, nullable=False)
-    ticket_type_id = Column(String, nullable=False)
+    # Lengths are required by MySQL, ids from the other services are short strings
+    event_id = Column(String(64), index=True, nullable=False)
+    user_id = Column(String(64), index=True, nullable=False)
+    ticket_type_id = Column(String(64), nullable=False)
     quantity = Column(Integer, nullable=False)
     total_price = Column(Float, nullable=False)
     status = Column(sqlEnum(PaymentStatus), default=PaymentStatus.PENDING)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
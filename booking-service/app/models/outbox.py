@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from app.database import Base
+
+class QuotaOutbox(Base):
+    """updateTicketSold calls still owed to ticket-service.
+
+    Written in the same transaction that marks the booking PAID and removed
+    once ticket-service has applied it.
+    """
+    __tablename__ = "quota_outbox"
+    __table_args__ = (Index("ix_quota_outbox_due", "status", "next_attempt_at"),)
+
+    id = Column(Integer, primary_key=True)
+    booking_id = Column(Integer, nullable=False, unique=True)
+    event_id = Column(String(64), nullable=False)
+    ticket_type_id = Column(String(64), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    # PENDING until delivered, FAILED when ticket-service refused it or the
+    # attempts ran out; FAILED rows wait for POST /internal/outbox/{booking_id}/retry
+    status = Column(String(16), nullable=False, default="PENDING")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String(500))
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    @property
+    def commit_id(self):
+        return f"booking-{self.booking_id}"
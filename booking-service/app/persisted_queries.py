@@ -0,0 +1,166 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import httpx
+from graphql import GraphQLError, parse, validate
+
+from app.config import settings
+from app.services.http_client import get_client
+
+NOT_FOUND = {
+    "errors": [{"message": "PersistedQueryNotFound", "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]
+}
+
+# sha256 -> query text, LRU bounded
+_queries = OrderedDict()
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def resolve_query(data: dict) -> Tuple[Optional[str], Optional[dict]]:
+    """Query text for a request body that may use Automatic Persisted Queries.
+
+    Returns (query, None) or (None, error_response) when the hash is unknown
+    or does not match the text sent with it.
+    """
+    query = data.get("query")
+    extensions = data.get("extensions")
+    persisted = extensions.get("persistedQuery") if isinstance(extensions, dict) else None
+    if not isinstance(persisted, dict):
+        return query, None
+    sha256 = persisted.get("sha256Hash")
+    if persisted.get("version") != 1 or not isinstance(sha256, str):
+        return None, {"errors": [{"message": "Unsupported persisted query version"}]}
+
+    if query:
+        if query_hash(query) != sha256:
+            return None, {"errors": [{"message": "provided sha does not match query"}]}
+        _queries[sha256] = query
+        if len(_queries) > settings.PERSISTED_QUERY_MAX_ENTRIES:
+            _queries.popitem(last=False)
+        return query, None
+
+    query = _queries.get(sha256)
+    if query is None:
+        return None, NOT_FOUND
+    _queries.move_to_end(sha256)
+    return query, None
+
+
+class DocumentCache:
+    """Parses and validates every distinct document once.
+
+    Documents are kept in an LRU keyed by the SHA-256 of the query text,
+    the same hash clients use for persisted queries. Documents that fail
+    validation are cached with their errors; syntax errors are not cached.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._documents = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, schema, query: str):
+        """Returns (document, None) or (None, errors)"""
+        key = query_hash(query)
+        entry = self._documents.get(key)
+        if entry is not None:
+            self._documents.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        try:
+            document = parse(query)
+        except GraphQLError as e:
+            return None, [e]
+        errors = validate(schema, document)
+        entry = (None, errors) if errors else (document, None)
+        self._documents[key] = entry
+        if len(self._documents) > self.max_entries:
+            self._documents.popitem(last=False)
+        return entry
+
+    def stats(self) -> dict:
+        return {"entries": len(self._documents), "hits": self.hits, "misses": self.misses}
+
+
+document_cache = DocumentCache(settings.DOCUMENT_CACHE_MAX_ENTRIES)
+
+
+# (url, hash) pairs the other service has already seen in full, LRU bounded
+_registered = OrderedDict()
+
+
+def _remember(key: Tuple[str, str]):
+    _registered[key] = True
+    _registered.move_to_end(key)
+    if len(_registered) > settings.PERSISTED_QUERY_MAX_ENTRIES:
+        _registered.popitem(last=False)
+
+
+async def post_graphql(url: str, query: str, variables: dict = None, timeout: float = 5) -> httpx.Response:
+    """POST a GraphQL operation to another service as a persisted query.
+
+    Only the hash is sent once the service has seen the full text; if it
+    forgot it (e.g. after a restart) the full text is sent again.
+    """
+    sha256 = query_hash(query)
+    extensions = {"persistedQuery": {"version": 1, "sha256Hash": sha256}}
+    client = get_client()
+    if (url, sha256) in _registered:
+        _registered.move_to_end((url, sha256))
+        response = await client.post(
+            url, json={"variables": variables, "extensions": extensions}, timeout=timeout
+        )
+        if not _is_not_found(response):
+            return response
+        _registered.pop((url, sha256), None)
+
+    response = await client.post(
+        url,
+        json={"query": query, "variables": variables, "extensions": extensions},
+        timeout=timeout,
+    )
+    if response.status_code == 200 and not _is_not_found(response):
+        _remember((url, sha256))
+    return response
+
+
+def _is_not_found(response: httpx.Response) -> bool:
+    if response.status_code != 200 or b"PersistedQueryNotFound" not in response.content:
+        return False
+    try:
+        errors = response.json().get("errors") or []
+    except ValueError:
+        return False
+    return any(error.get("message") == "PersistedQueryNotFound" for error in errors)
+
+
+async def fetch_many(url: str, field: str, selection: str, ids: list, timeout: float = 5) -> list:
+    """Looks up several ids with one aliased `field(id: ...)` operation.
+
+    Returns one entry per id: the object, None when the service has no such
+    id, or an Exception when only that alias failed.
+    """
+    definitions = ", ".join(f"$id{i}: ID!" for i in range(len(ids)))
+    fields = " ".join(f"r{i}: {field}(id: $id{i}) {{ {selection} }}" for i in range(len(ids)))
+    variables = {f"id{i}": str(id) for i, id in enumerate(ids)}
+    response = await post_graphql(url, f"query ({definitions}) {{ {fields} }}", variables, timeout=timeout)
+    if response.status_code != 200:
+        raise Exception(f"Failed to connect to {url}: {response.text}")
+
+    payload = response.json()
+    data = payload.get("data")
+    if not isinstance(data, dict):
+        raise Exception(f"Service Error: {payload.get('errors')}")
+    errors = {}
+    for error in payload.get("errors") or []:
+        path = error.get("path") or []
+        if path:
+            errors[path[0]] = Exception(error.get("message", "Unknown error"))
+    return [errors.get(f"r{i}", data.get(f"r{i}")) for i in range(len(ids))]
@@ -1,20 +1,126 @@
-﻿import graphene
+﻿import asyncio
+import base64
+import time
+import graphene
 import uuid
-import requests
+import httpx
 import json
 from graphene_sqlalchemy import SQLAlchemyObjectType
 from app.models.booking import Booking as BookingModel, PaymentStatus as StatusEnum
 from app.config import settings
+from app.database import AsyncSessionLocal
+from app.persisted_queries import post_graphql
+from app.services.booking_writer import booking_writer
+from app.services.catalog_cache import event_cache, ticket_cache
+from app.services.dataloader import DataLoader
+from app.services.event_consumer import get_events
+from app.services.ticket_consumer import get_ticket_types
+from app.services.idempotency import idempotency
+from app.services.quota_outbox import quota_outbox
+from app.models.outbox import QuotaOutbox
+from app.tracing import traced
 from datetime import datetime
-from sqlalchemy import select
+from sqlalchemy import select, update, func
 
 StatusEnumGraphene = graphene.Enum.from_enum(StatusEnum)
 
+class EventInfo(graphene.ObjectType):
+    id = graphene.ID()
+    title = graphene.String()
+    description = graphene.String()
+    start_time = graphene.String()
+    end_time = graphene.String()
+    status = graphene.String()
+
+class TicketTypeInfo(graphene.ObjectType):
+    id = graphene.ID()
+    name = graphene.String()
+    price = graphene.Int()
+
 class BookingType(SQLAlchemyObjectType):
     class Meta:
         model = BookingModel
     
     status = StatusEnumGraphene()
+    event = graphene.Field(EventInfo)
+    ticket_type = graphene.Field(TicketTypeInfo)
+    quota_status = graphene.String(
+        description="PAID bookings only: PENDING until Ticket Service applied the sale, "
+                    "COMMITTED after, FAILED when it was refused and needs operator action"
+    )
+    quota_error = graphene.String(description="Why the quota commit FAILED")
+
+    async def resolve_event(parent, info):
+        return await info.context["loaders"]["event"].load(str(parent.event_id))
+
+    async def resolve_ticket_type(parent, info):
+        return await info.context["loaders"]["ticket_type"].load(str(parent.ticket_type_id))
+
+    async def resolve_quota_status(parent, info):
+        if parent.status != StatusEnum.PAID:
+            return None
+        row = await info.context["loaders"]["quota"].load(parent.id)
+        # Delivered rows are deleted
+        return row.status if row is not None else "COMMITTED"
+
+    async def resolve_quota_error(parent, info):
+        if parent.status != StatusEnum.PAID:
+            return None
+        row = await info.context["loaders"]["quota"].load(parent.id)
+        return row.last_error if row is not None and row.status == "FAILED" else None
+
+async def load_event_details(event_ids):
+    try:
+        return await get_events(event_ids)
+    except httpx.HTTPError as e:
+        raise Exception(f"Integration Error: Could not reach Event Service. {str(e)}")
+
+async def load_ticket_type_details(ticket_type_ids):
+    try:
+        return await get_ticket_types(ticket_type_ids)
+    except httpx.HTTPError as e:
+        raise Exception(f"Integration Error: Could not reach Ticket Service. {str(e)}")
+
+async def load_quota_rows(booking_ids):
+    # Own session, the request's one may be busy with another resolver
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(QuotaOutbox).where(QuotaOutbox.booking_id.in_(booking_ids)))
+        rows = {row.booking_id: row for row in result.scalars()}
+    return [rows.get(booking_id) for booking_id in booking_ids]
+
+def create_loaders():
+    """Per-request loaders behind BookingType.event, ticketType and quotaStatus"""
+    return {
+        "event": DataLoader(load_event_details),
+        "ticket_type": DataLoader(load_ticket_type_details),
+        "quota": DataLoader(load_quota_rows),
+    }
+
+class BookingConnection(graphene.relay.Connection):
+    class Meta:
+        node = BookingType
+
+    total_count = graphene.Int(description="Bookings matching userId/status across all pages")
+
+    async def resolve_total_count(parent, info):
+        # Only runs when totalCount is selected
+        session = info.context.get("db")
+        result = await session.execute(
+            select(func.count()).select_from(BookingModel).where(*parent.filters)
+        )
+        return result.scalar_one()
+
+def encode_cursor(booking_id) -> str:
+    return base64.b64encode(f"booking:{booking_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        prefix, booking_id = base64.b64decode(cursor.encode(), validate=True).decode().split(":")
+        if prefix != "booking":
+            raise ValueError(prefix)
+        return int(booking_id)
+    except ValueError:
+        raise Exception(f"Invalid cursor: {cursor}")
 
 class CreateBookingInput(graphene.InputObjectType):
     event_id = graphene.ID(required=True)
@@ -23,17 +129,117 @@ class CreateBookingInput(graphene.InputObjectType):
 
 class Query(graphene.ObjectType):
     booking = graphene.Field(BookingType, id=graphene.ID(required=True))
-    bookings_by_user = graphene.List(BookingType, user_id=graphene.ID(required=True))
+    bookings_by_user = graphene.Field(
+        BookingConnection,
+        user_id=graphene.ID(required=True),
+        first=graphene.Int(),
+        after=graphene.String(),
+        status=StatusEnumGraphene(),
+    )
 
     async def resolve_booking(self, info, id):
         session = info.context.get("db")
         result = await session.execute(select(BookingModel).filter_by(id=str(id)))
         return result.scalars().first()
 
-    async def resolve_bookings_by_user(self, info, user_id):
-        session = info.context.get("db")
-        result = await session.execute(select(BookingModel).filter_by(user_id=str(user_id)))
-        return result.scalars().all()
+    async def resolve_bookings_by_user(self, info, user_id, **kwargs):
+        return await get_bookings_by_user(self, info, user_id, **kwargs)
+
+async def load_event(event_id):
+    event_query = """
+    query ($id: ID!) {
+        event(id: $id) {
+            id
+            title
+            status
+        }
+    }
+    """
+    event_vars = {"id": str(event_id)}
+
+    try:
+        event_res = await post_graphql(settings.EVENT_SERVICE_URL, event_query, event_vars, timeout=5)
+    except httpx.HTTPError as e:
+        raise Exception(f"Integration Error: Could not reach Event Service. {str(e)}")
+
+    if event_res.status_code != 200:
+         raise Exception(f"Failed to connect to Event Service: {event_res.text}")
+
+    event_data = event_res.json()
+    if 'errors' in event_data:
+        raise Exception(f"Event Service Error: {event_data['errors']}")
+
+    event_obj = event_data['data']['event']
+    if not event_obj:
+        raise Exception(f"Event with ID {event_id} not found.")
+
+    return event_obj
+
+async def fetch_event(event_id):
+    event_obj = await event_cache.get(str(event_id), load_event)
+
+    if event_obj['status'] != 'SCHEDULED':
+         raise Exception(f"Event '{event_obj['title']}' is not open for booking (Status: {event_obj['status']}). Only SCHEDULED events can be booked.")
+
+    return event_obj
+
+async def load_ticket_types(event_id):
+    query = """
+    query ($eventId: ID!) {
+        ticketTypesByEvent(eventId: $eventId) {
+            id
+            price
+            quota
+            sold
+        }
+    }
+    """
+    variables = {"eventId": str(event_id)}
+
+    try:
+        response = await post_graphql(settings.TICKET_SERVICE_URL, query, variables, timeout=5)
+    except httpx.HTTPError as e:
+        raise Exception(f"Integration Error: Could not reach Ticket Service. {str(e)}")
+
+    if response.status_code != 200:
+        raise Exception(f"Failed to connect to Ticket Service: {response.text}")
+
+    data = response.json()
+    if 'errors' in data:
+        raise Exception(f"Ticket Service Error: {data['errors']}")
+
+    return data['data']['ticketTypesByEvent']
+
+async def fetch_ticket_types(event_id):
+    # Quota here may lag a few seconds, updateTicketSold enforces it for real
+    return await ticket_cache.get(str(event_id), load_ticket_types)
+
+async def gather_or_cancel(*awaitables):
+    """Like asyncio.gather, but the first failure cancels the others.
+
+    When several fail together the error of the earliest awaitable wins,
+    so callers see the same message as if they had run in order.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    except asyncio.CancelledError:
+        pending = tasks
+        raise
+    finally:
+        # Not awaited: a cancel landing while httpx finishes a connect can be
+        # absorbed by anyio, and the caller should not wait for that call anyway
+        for task in pending:
+            task.cancel()
+            task.add_done_callback(_discard_result)
+    for task in tasks:
+        if task in done and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+def _discard_result(task):
+    if not task.cancelled():
+        task.exception()
 
 class CreateBooking(graphene.Mutation):
     class Arguments:
@@ -43,108 +249,50 @@ class CreateBooking(graphene.Mutation):
 
     async def mutate(self, info, input):
         user_id = info.context.get("user_id")
-        session = info.context.get("db")
         
         if not user_id:
              raise Exception("Authentication Failed: User identity not found")
 
-        event_query = """
-        query ($id: ID!) {
-            event(id: $id) {
-                id
-                title
-                status
-            }
-        }
-        """
-        event_vars = {"id": str(input.event_id)}
+        params = {"event_id": input.event_id, "ticket_type_id": input.ticket_type_id, "quantity": input.quantity}
+        return await idempotency.run(
+            info, "createBooking", user_id, params, lambda: CreateBooking.create(info, user_id, input)
+        )
+
+    @staticmethod
+    async def create(info, user_id, input):
+        # Event and ticket lookups are independent, the slower one sets the latency
+        started = time.perf_counter()
+        event_obj, tickets = await gather_or_cancel(
+            traced("event_lookup", started, fetch_event(input.event_id)),
+            traced("ticket_lookup", started, fetch_ticket_types(input.event_id)),
+        )
+
+        target_ticket = None
+        for t in tickets:
+            if str(t['id']) == str(input.ticket_type_id):
+                target_ticket = t
+                break
         
-        try:
-            event_res = requests.post(
-                settings.EVENT_SERVICE_URL,
-                json={'query': event_query, 'variables': event_vars},
-                headers={'Content-Type': 'application/json'},
-                timeout=5
-            )
-            
-            if event_res.status_code != 200:
-                 raise Exception(f"Failed to connect to Event Service: {event_res.text}")
-            
-            event_data = event_res.json()
-            if 'errors' in event_data:
-                raise Exception(f"Event Service Error: {event_data['errors']}")
+        if not target_ticket:
+            raise Exception(f"Ticket Type ID '{input.ticket_type_id}' not found in this Event.")
             
-            event_obj = event_data['data']['event']
-            if not event_obj:
-                raise Exception(f"Event with ID {input.event_id} not found.")
-            
-            if event_obj['status'] != 'SCHEDULED':
-                 raise Exception(f"Event '{event_obj['title']}' is not open for booking (Status: {event_obj['status']}). Only SCHEDULED events can be booked.")
-
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Integration Error: Could not reach Event Service. {str(e)}")
-
-        query = """
-        query ($eventId: ID!) {
-            ticketTypesByEvent(eventId: $eventId) {
-                id
-                price
-                quota
-                sold
-            }
-        }
-        """
-        variables = {"eventId": str(input.event_id)}
+        sold_count = target_ticket.get('sold', 0)
+        if (target_ticket['quota'] - sold_count) < input.quantity:
+            raise Exception(f"Quota insufficient. Remaining: {target_ticket['quota'] - sold_count}")
         
-        try:
-            response = requests.post(
-                settings.TICKET_SERVICE_URL,
-                json={'query': query, 'variables': variables},
-                headers={'Content-Type': 'application/json'},
-                timeout=5
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Failed to connect to Ticket Service: {response.text}")
-                
-            data = response.json()
-            if 'errors' in data:
-                raise Exception(f"Ticket Service Error: {data['errors']}")
-            
-            tickets = data['data']['ticketTypesByEvent']
-            
-            target_ticket = None
-            for t in tickets:
-                if str(t['id']) == str(input.ticket_type_id):
-                    target_ticket = t
-                    break
-            
-            if not target_ticket:
-                raise Exception(f"Ticket Type ID '{input.ticket_type_id}' not found in this Event.")
-                
-            sold_count = target_ticket.get('sold', 0)
-            if (target_ticket['quota'] - sold_count) < input.quantity:
-                raise Exception(f"Quota insufficient. Remaining: {target_ticket['quota'] - sold_count}")
-            
-            total_price = target_ticket['price'] * input.quantity
-
-            booking = BookingModel(
-                event_id=str(input.event_id),
-                user_id=str(user_id),
-                ticket_type_id=str(input.ticket_type_id),
-                quantity=input.quantity,
-                total_price=float(total_price),
-                status=StatusEnum.PENDING
-            )
-            
-            session.add(booking)
-            await session.commit()
-            await session.refresh(booking)
-
-            return booking
-
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Integration Error: Could not reach Ticket Service. {str(e)}")
+        total_price = target_ticket['price'] * input.quantity
+
+        booking = BookingModel(
+            event_id=str(input.event_id),
+            user_id=str(user_id),
+            ticket_type_id=str(input.ticket_type_id),
+            quantity=input.quantity,
+            total_price=float(total_price),
+            status=StatusEnum.PENDING
+        )
+        
+        # Committed together with other concurrent bookings
+        return await traced("booking_insert", started, booking_writer.add(booking))
 
 class ConfirmPayment(graphene.Mutation):
     class Arguments:
@@ -154,11 +302,18 @@ class ConfirmPayment(graphene.Mutation):
 
     async def mutate(self, info, id):
         user_id = info.context.get("user_id")
-        session = info.context.get("db")
         
         if not user_id:
              raise Exception("Authentication Failed: User identity not found")
 
+        return await idempotency.run(
+            info, "confirmPayment", user_id, {"id": id}, lambda: ConfirmPayment.confirm(info, user_id, id)
+        )
+
+    @staticmethod
+    async def confirm(info, user_id, id):
+        session = info.context.get("db")
+
         result = await session.execute(select(BookingModel).filter_by(id=str(id)))
         booking = result.scalars().first()
 
@@ -171,36 +326,25 @@ class ConfirmPayment(graphene.Mutation):
         if booking.status != StatusEnum.PENDING:
             raise Exception(f"Invalid status: Cannot confirm booking with status {booking.status}")
 
-        update_query = """
-        mutation ($id: ID!, $qty: Int!) {
-            updateTicketSold(id: $id, quantity: $qty) {
-                id
-                sold
-            }
-        }
-        """
-        update_vars = {"id": str(booking.ticket_type_id), "qty": booking.quantity}
-        
-        try:
-            quota_response = requests.post(
-                settings.TICKET_SERVICE_URL, 
-                json={'query': update_query, 'variables': update_vars},
-                headers={'Content-Type': 'application/json'},
-                timeout=5
-            )
-            
-            if quota_response.status_code != 200:
-                raise Exception(f"Failed to update ticket quota: {quota_response.text}")
-            
-            quota_data = quota_response.json()
-            if 'errors' in quota_data:
-                raise Exception(f"Ticket quota update failed: {quota_data['errors']}")
-                
-        except Exception as e:
-            raise Exception(f"Confirmation failed - could not update ticket quota: {str(e)}")
-
-        booking.status = StatusEnum.PAID
+        # Status and the quota commit owed to ticket-service go in one local
+        # transaction; the outbox worker delivers the commit in the background.
+        # The guarded update keeps two concurrent confirmations from both winning.
+        paid = await session.execute(
+            update(BookingModel)
+            .where(BookingModel.id == booking.id, BookingModel.status == StatusEnum.PENDING)
+            .values(status=StatusEnum.PAID)
+        )
+        if paid.rowcount != 1:
+            await session.rollback()
+            raise Exception("Invalid status: Booking was confirmed or cancelled concurrently")
+        session.add(QuotaOutbox(
+            booking_id=booking.id,
+            event_id=str(booking.event_id),
+            ticket_type_id=str(booking.ticket_type_id),
+            quantity=booking.quantity,
+        ))
         await session.commit()
+        quota_outbox.notify()
         await session.refresh(booking)
 
         return booking
@@ -210,10 +354,43 @@ async def get_booking(parent, info, id):
     result = await session.execute(select(BookingModel).filter_by(id=id))
     return result.scalars().first()
 
-async def get_bookings_by_user(parent, info, user_id):
+async def get_bookings_by_user(parent, info, user_id, first=None, after=None, status=None):
+    """Newest first, one page per call.
+
+    Keyset pagination on the (user_id, status, id) index: a page reads at
+    most first + 1 rows, however many bookings the user has.
+    """
+    if first is None:
+        first = settings.BOOKINGS_PAGE_SIZE
+    if not 1 <= first <= settings.BOOKINGS_PAGE_MAX:
+        raise Exception(f"first must be between 1 and {settings.BOOKINGS_PAGE_MAX}")
+
+    filters = [BookingModel.user_id == str(user_id)]
+    if status is not None:
+        filters.append(BookingModel.status == status)
+
+    query = select(BookingModel).where(*filters)
+    if after:
+        query = query.where(BookingModel.id < decode_cursor(after))
     session = info.context.get("db")
-    result = await session.execute(select(BookingModel).filter_by(user_id=str(user_id)))
-    return result.scalars().all()
+    result = await session.execute(query.order_by(BookingModel.id.desc()).limit(first + 1))
+    bookings = result.scalars().all()
+
+    edges = [
+        BookingConnection.Edge(node=booking, cursor=encode_cursor(booking.id))
+        for booking in bookings[:first]
+    ]
+    connection = BookingConnection(
+        edges=edges,
+        page_info=graphene.relay.PageInfo(
+            has_next_page=len(bookings) > first,
+            has_previous_page=bool(after),
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+        ),
+    )
+    connection.filters = filters
+    return connection
 
 async def create_booking(parent, info, input):
     mutation = CreateBooking()
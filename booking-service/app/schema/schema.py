@@ -1,6 +1,8 @@
 import graphene
 from app.schema.booking_schema import (
     BookingType, 
+    BookingConnection,
+    StatusEnumGraphene,
     CreateBookingInput, 
     get_booking, 
     get_bookings_by_user, 
@@ -11,7 +13,14 @@ from app.schema.booking_schema import (
 
 class Query(graphene.ObjectType):
     booking = graphene.Field(BookingType, id=graphene.ID(required=True), resolver=get_booking)
-    bookings_by_user = graphene.List(BookingType, user_id=graphene.ID(required=True), resolver=get_bookings_by_user)
+    bookings_by_user = graphene.Field(
+        BookingConnection,
+        user_id=graphene.ID(required=True),
+        first=graphene.Int(),
+        after=graphene.String(),
+        status=StatusEnumGraphene(),
+        resolver=get_bookings_by_user,
+    )
 
 class Mutation(graphene.ObjectType):
     create_booking = graphene.Field(BookingType, input=CreateBookingInput(required=True), resolver=create_booking)
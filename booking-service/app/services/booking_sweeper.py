@@ -0,0 +1,112 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.booking import Booking as BookingModel, PaymentStatus as StatusEnum
+
+
+class BookingSweeper:
+    """Expires PENDING bookings that were not paid within the hold time.
+
+    Every interval the bookings past their hold are cancelled in batches of
+    at most batch_size rows, each batch in its own short transaction so
+    createBooking/confirmPayment are never blocked behind one large UPDATE.
+    The UPDATE keeps the PENDING condition, a booking confirmed in the
+    meantime stays PAID.
+    """
+
+    def __init__(self, hold: timedelta, interval: float, batch_size: int, enabled: bool = True):
+        self.hold = hold
+        self.interval = interval
+        self.batch_size = batch_size
+        self.enabled = enabled
+        self._task = None
+        self.sweeps = 0
+        self.swept = 0
+        self.last_swept = 0
+        self.last_duration_ms = 0.0
+        self.last_sweep_at = None
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep_once()
+            except Exception as e:
+                print(f"Booking sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sweep_once(self) -> int:
+        started = time.perf_counter()
+        cutoff = datetime.utcnow() - self.hold
+        swept = 0
+        while True:
+            selected, expired = await self._expire_batch(cutoff)
+            swept += expired
+            if selected < self.batch_size:
+                break
+            # Let requests waiting on the database in between batches
+            await asyncio.sleep(0)
+
+        self.sweeps += 1
+        self.swept += swept
+        self.last_swept = swept
+        self.last_duration_ms = (time.perf_counter() - started) * 1000
+        self.last_sweep_at = datetime.utcnow()
+        if swept:
+            print(f"Booking sweep expired {swept} PENDING bookings in {self.last_duration_ms:.1f}ms")
+        return swept
+
+    async def _expire_batch(self, cutoff: datetime):
+        """Returns (bookings selected, bookings actually expired)"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(BookingModel.id)
+                .where(BookingModel.status == StatusEnum.PENDING, BookingModel.created_at < cutoff)
+                .order_by(BookingModel.created_at)
+                .limit(self.batch_size)
+            )
+            ids = result.scalars().all()
+            if not ids:
+                return 0, 0
+            result = await session.execute(
+                update(BookingModel)
+                .where(BookingModel.id.in_(ids), BookingModel.status == StatusEnum.PENDING)
+                .values(status=StatusEnum.CANCELLED)
+            )
+            await session.commit()
+            return len(ids), result.rowcount
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "hold_minutes": self.hold.total_seconds() / 60,
+            "sweeps": self.sweeps,
+            "swept": self.swept,
+            "last_swept": self.last_swept,
+            "last_duration_ms": round(self.last_duration_ms, 1),
+            "last_sweep_at": self.last_sweep_at,
+        }
+
+
+booking_sweeper = BookingSweeper(
+    hold=timedelta(minutes=settings.BOOKING_HOLD_MINUTES),
+    interval=settings.BOOKING_SWEEP_INTERVAL,
+    batch_size=settings.BOOKING_SWEEP_BATCH_SIZE,
+    enabled=settings.BOOKING_SWEEP_ENABLED,
+)
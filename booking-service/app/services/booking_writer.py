@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+
+
+class GroupCommitWriter:
+    """Commits concurrent booking inserts together.
+
+    Callers queue their row and wait on a future. The worker takes the first
+    queued row, gathers more for up to `max_delay` seconds or `max_batch`
+    rows, inserts them in one transaction and resolves every future with
+    its own (now persisted) row. Rows arriving during a commit form the next
+    batch, so throughput grows with concurrency instead of being capped by
+    one fsync per booking.
+    """
+
+    def __init__(self, max_batch: int, max_delay: float, enabled: bool = True):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.enabled = enabled
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.rows = 0
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        # Anything still queued is written directly rather than dropped
+        while not self._queue.empty():
+            await self._commit([self._queue.get_nowait()])
+
+    async def add(self, row):
+        """Inserts `row` and returns it once its transaction has committed"""
+        if self._task is None:
+            await self._commit_rows([row])
+            return row
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._commit(batch)
+
+    async def _commit(self, batch):
+        try:
+            await self._commit_rows([row for row, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                _resolve(batch, error=e)
+                return
+            # One bad row must not fail its neighbours, retry them one by one
+            for item in batch:
+                await self._commit([item])
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        _resolve(batch)
+
+    async def _commit_rows(self, rows):
+        async with AsyncSessionLocal() as session:
+            session.add_all(rows)
+            await session.commit()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch": round(self.rows / self.batches, 2) if self.batches else 0,
+        }
+
+
+def _resolve(batch, error=None):
+    for row, future in batch:
+        # The caller may have given up (client disconnect), its row is kept
+        if future.done():
+            continue
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(row)
+
+
+booking_writer = GroupCommitWriter(
+    max_batch=settings.BOOKING_WRITE_BATCH_SIZE,
+    max_delay=settings.BOOKING_WRITE_MAX_DELAY_MS / 1000,
+    enabled=settings.BOOKING_WRITE_BATCHING,
+)
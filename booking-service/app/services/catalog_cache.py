@@ -0,0 +1,108 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from app.config import settings
+
+
+class CatalogCache:
+    """Read-through cache for data owned by another service.
+
+    Entries younger than `ttl` are served as is. Up to `stale_ttl` later they
+    are still served, while one background load refreshes them
+    (stale-while-revalidate). Concurrent misses for the same key share a
+    single load, and failed loads are never cached.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float, max_entries: int, enabled: bool = True):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._loading = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, loader):
+        if not self.enabled:
+            return await loader(key)
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                if key not in self._loading:
+                    self._load(key, loader).add_done_callback(_discard_result)
+                return value
+        self.misses += 1
+        task = self._loading.get(key) or self._load(key, loader)
+        # Shielded: a cancelled caller must not cancel a load others share
+        return await asyncio.shield(task)
+
+    def _load(self, key: str, loader) -> asyncio.Task:
+        task = asyncio.ensure_future(loader(key))
+        self._loading[key] = task
+
+        def store(done):
+            # An invalidation during the load dropped this task, its result is outdated
+            if self._loading.get(key) is not done:
+                return
+            del self._loading[key]
+            if done.cancelled() or done.exception() is not None:
+                return
+            self._entries[key] = (done.result(), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        task.add_done_callback(store)
+        return task
+
+    def invalidate(self, key: str = None):
+        if key is None:
+            self._entries.clear()
+            self._loading.clear()
+        else:
+            self._entries.pop(key, None)
+            self._loading.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+        }
+
+
+def _discard_result(task):
+    if not task.cancelled():
+        task.exception()
+
+
+# Event metadata changes rarely, ticket quotas move with every sale
+event_cache = CatalogCache(
+    "event",
+    ttl=settings.EVENT_CACHE_TTL,
+    stale_ttl=settings.CATALOG_CACHE_STALE_TTL,
+    max_entries=settings.CATALOG_CACHE_MAX_ENTRIES,
+    enabled=settings.CATALOG_CACHE_ENABLED,
+)
+ticket_cache = CatalogCache(
+    "ticket",
+    ttl=settings.TICKET_CACHE_TTL,
+    stale_ttl=settings.CATALOG_CACHE_STALE_TTL,
+    max_entries=settings.CATALOG_CACHE_MAX_ENTRIES,
+    enabled=settings.CATALOG_CACHE_ENABLED,
+)
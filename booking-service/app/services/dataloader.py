@@ -0,0 +1,50 @@
+import asyncio
+
+
+class DataLoader:
+    """Collects the keys loaded in one tick of the event loop into one batch.
+
+    graphql resolves the fields of every item in a list before any of them
+    gets a result back, so the `event` fields of 200 bookings become a single
+    batch_fn call. batch_fn receives the distinct keys and returns one value
+    (or Exception) per key in the same order. Results are kept for the
+    lifetime of the loader, create one per request.
+    """
+
+    def __init__(self, batch_fn):
+        self.batch_fn = batch_fn
+        self._futures = {}
+        self._queue = []
+        # The loop only keeps weak references to tasks
+        self._tasks = set()
+
+    def load(self, key):
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                loop.call_soon(self._schedule, loop)
+        return future
+
+    def _schedule(self, loop):
+        task = loop.create_task(self._dispatch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self):
+        keys, self._queue = self._queue, []
+        try:
+            values = await self.batch_fn(keys)
+        except Exception as e:
+            values = [e] * len(keys)
+        for key, value in zip(keys, values):
+            future = self._futures[key]
+            if isinstance(value, Exception):
+                # Forget failures so a later load in the same request retries
+                del self._futures[key]
+                future.set_exception(value)
+            else:
+                future.set_result(value)
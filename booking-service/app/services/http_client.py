@@ -0,0 +1,33 @@
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+
+# One pooled client per worker, opened and closed by the app lifespan
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared AsyncClient for calls to the other services.
+
+    Keep-alive connections are reused across bookings, so a slow ticket or
+    event call only holds its own connection instead of the event loop.
+    """
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=settings.HTTP_CLIENT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.booking import Booking as BookingModel
+from app.models.idempotency import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+
+class IdempotencyStore:
+    """Runs a booking mutation at most once per Idempotency-Key.
+
+    The key is claimed with an insert before the mutation runs, so
+    duplicates reaching other workers or replicas see the claim and wait
+    for its booking instead of running again. Only the booking id is kept
+    per key, replays re-read the booking and never call the event/ticket
+    services again. Failed attempts release the key, so a retry after an
+    error runs again; a claim whose holder died is taken over after lease.
+    """
+
+    def __init__(self, ttl: timedelta, lease: timedelta, wait: float, poll_interval: float = 0.05,
+                 purge_every: int = 500):
+        self.ttl = ttl
+        self.lease = lease
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self.purge_every = purge_every
+        self._inflight = {}
+        self._stored = 0
+        self.replays = 0
+
+    async def run(self, info, operation: str, user_id, params: dict, work):
+        request = info.context.get("request")
+        header = request.headers.get(HEADER) if request is not None else None
+        if not header:
+            return await work()
+        if len(header) > 128:
+            raise Exception(f"{HEADER} must be at most 128 characters")
+
+        key = f"{user_id}:{operation}:{header}"
+        request_hash = hashlib.sha256(
+            json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        session = info.context.get("db")
+
+        # Duplicates within this process wait on the future, no polling
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            first_hash, future = inflight
+            _check_same_request(first_hash, request_hash)
+            booking_id = await asyncio.shield(future)
+            return await self._replay(session, booking_id)
+
+        # Registered before the first await so duplicates can't slip past
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (request_hash, future)
+        try:
+            booking_id = await self._claim(key, request_hash)
+            if booking_id is not None:
+                future.set_result(booking_id)
+                return await self._replay(session, booking_id)
+
+            try:
+                booking = await work()
+            except BaseException:
+                await asyncio.shield(self._release(key))
+                raise
+            await self._complete(key, booking.id)
+            future.set_result(booking.id)
+            return booking
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e if isinstance(e, Exception) else Exception("Request was cancelled"))
+                # Nobody may be waiting, which is fine
+                future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _claim(self, key: str, request_hash: str):
+        """None once this request owns the key, else the booking id to replay"""
+        deadline = asyncio.get_running_loop().time() + self.wait
+        while True:
+            async with AsyncSessionLocal() as session:
+                session.add(IdempotencyKey(key=key, request_hash=request_hash))
+                try:
+                    await session.commit()
+                    return None
+                except IntegrityError:
+                    await session.rollback()
+                stored = await session.get(IdempotencyKey, key, populate_existing=True)
+                if stored is None:
+                    # Released between our insert and read, claim again
+                    continue
+                now = datetime.utcnow()
+                abandoned = stored.booking_id is None and stored.created_at < now - self.lease
+                if stored.created_at < now - self.ttl or abandoned:
+                    await session.execute(
+                        delete(IdempotencyKey).where(
+                            IdempotencyKey.key == key, IdempotencyKey.created_at == stored.created_at
+                        )
+                    )
+                    await session.commit()
+                    continue
+                _check_same_request(stored.request_hash, request_hash)
+                if stored.booking_id is not None:
+                    return stored.booking_id
+
+            # Claimed by another worker that is still running it
+            if asyncio.get_running_loop().time() >= deadline:
+                raise Exception(f"A request with this {HEADER} is still in progress, retry later")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _complete(self, key: str, booking_id: int):
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(IdempotencyKey).where(IdempotencyKey.key == key).values(booking_id=booking_id)
+            )
+            await session.commit()
+        self._stored += 1
+        if self._stored % self.purge_every == 0:
+            await self.purge()
+
+    async def _release(self, key: str):
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.booking_id.is_(None))
+            )
+            await session.commit()
+
+    async def _replay(self, session, booking_id):
+        self.replays += 1
+        return await session.get(BookingModel, booking_id, populate_existing=True)
+
+    async def purge(self):
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.created_at < datetime.utcnow() - self.ttl)
+            )
+            await session.commit()
+
+
+def _check_same_request(stored_hash: str, request_hash: str):
+    if stored_hash != request_hash:
+        raise Exception(f"{HEADER} was already used for a different request")
+
+
+idempotency = IdempotencyStore(
+    ttl=timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+    lease=timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS),
+    wait=settings.IDEMPOTENCY_WAIT_SECONDS,
+)
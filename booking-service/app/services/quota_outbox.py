@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.outbox import QuotaOutbox
+from app.persisted_queries import post_graphql
+from app.services.catalog_cache import ticket_cache
+
+# ticket-service answers that retrying can't fix
+PERMANENT_ERRORS = ("Not enough quota", "Ticket not found")
+
+
+def build_batch(rows):
+    """One mutation document with an aliased updateTicketSold per row"""
+    definitions, fields, variables = [], [], {}
+    for i, row in enumerate(rows):
+        definitions.append(f"$id{i}: ID!, $q{i}: Int!, $c{i}: String")
+        fields.append(f"c{i}: updateTicketSold(id: $id{i}, quantity: $q{i}, commitId: $c{i}) {{ id sold }}")
+        variables.update({f"id{i}": row.ticket_type_id, f"q{i}": row.quantity, f"c{i}": row.commit_id})
+    query = f"mutation ({', '.join(definitions)}) {{ {' '.join(fields)} }}"
+    return query, variables
+
+
+class QuotaOutboxWorker:
+    """Delivers quota commits recorded by confirmPayment to ticket-service.
+
+    Due rows are sent in batches as one aliased mutation. Each carries a
+    commit id that ticket-service records, so a batch that is redelivered
+    after a timeout is not counted twice. Transport failures back off and
+    retry. A row ticket-service refuses (sold out meanwhile) or that ran
+    out of attempts is marked FAILED and left for an operator: the booking
+    is paid, so it stays PAID and shows quotaStatus FAILED until the row is
+    retried or the payment is refunded by hand.
+    """
+
+    def __init__(self, batch_size: int, poll_interval: float, max_attempts: int, enabled: bool = True):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.enabled = enabled
+        self._wake = None
+        self._task = None
+        self.delivered = 0
+        self.failed = 0
+        self.retries = 0
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def notify(self):
+        """Called after a commit that added rows, so they go out right away"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.drain_once()
+            except Exception as e:
+                print(f"Quota outbox drain failed: {e}")
+                processed = 0
+            if processed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def drain_once(self) -> int:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(QuotaOutbox)
+                .where(QuotaOutbox.status == "PENDING", QuotaOutbox.next_attempt_at <= datetime.utcnow())
+                .order_by(QuotaOutbox.id)
+                .limit(self.batch_size)
+            )
+            rows = result.scalars().all()
+            if not rows:
+                return 0
+
+            try:
+                errors = await self._send(rows)
+            except Exception as e:
+                for row in rows:
+                    self._retry(row, str(e))
+                await session.commit()
+                return len(rows)
+
+            events = set()
+            for row in rows:
+                error = errors.get(row.id)
+                if error is None:
+                    await session.delete(row)
+                    events.add(row.event_id)
+                    self.delivered += 1
+                elif error.startswith(PERMANENT_ERRORS) or row.attempts + 1 >= self.max_attempts:
+                    row.status = "FAILED"
+                    row.attempts += 1
+                    row.last_error = error[:500]
+                    self.failed += 1
+                    print(f"Quota commit for booking {row.booking_id} failed, needs operator action: {error}")
+                else:
+                    self._retry(row, error)
+            await session.commit()
+
+        for event_id in events:
+            ticket_cache.invalidate(event_id)
+        return len(rows)
+
+    async def _send(self, rows):
+        """Returns {row id: error message} for the rows ticket-service refused"""
+        query, variables = build_batch(rows)
+        response = await post_graphql(settings.TICKET_SERVICE_URL, query, variables, timeout=10)
+        if response.status_code != 200:
+            raise Exception(f"Ticket Service returned {response.status_code}")
+        payload = response.json()
+        data = payload.get("data")
+        if not isinstance(data, dict):
+            # The whole document failed (e.g. validation), nothing was applied
+            raise Exception(f"Ticket Service Error: {payload.get('errors')}")
+
+        messages = {}
+        for error in payload.get("errors") or []:
+            path = error.get("path") or []
+            if path:
+                messages[path[0]] = error.get("message", "Unknown error")
+        errors = {}
+        for i, row in enumerate(rows):
+            alias = f"c{i}"
+            if data.get(alias) is None:
+                errors[row.id] = messages.get(alias, "Ticket Service returned no result")
+        return errors
+
+    async def requeue(self, booking_id: int) -> bool:
+        """Sends a FAILED row again, e.g. after the ticket quota was raised"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(QuotaOutbox)
+                .where(QuotaOutbox.booking_id == booking_id, QuotaOutbox.status == "FAILED")
+                .values(status="PENDING", attempts=0, next_attempt_at=datetime.utcnow())
+            )
+            await session.commit()
+        if result.rowcount:
+            self.notify()
+        return bool(result.rowcount)
+
+    def _retry(self, row, error: str):
+        row.attempts += 1
+        row.last_error = error[:500]
+        row.next_attempt_at = datetime.utcnow() + timedelta(seconds=min(60, 2 ** row.attempts))
+        self.retries += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retries": self.retries,
+        }
+
+
+quota_outbox = QuotaOutboxWorker(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+)
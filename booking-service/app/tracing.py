@@ -0,0 +1,31 @@
+import asyncio
+import logging
+import time
+
+# Spans are DEBUG records, the app's logging config decides whether they show
+logger = logging.getLogger(__name__)
+
+
+async def traced(name: str, started: float, awaitable):
+    """Awaits and logs a span: start offset from `started` and duration.
+
+    Spans of one request share `started`, so overlapping calls show up as
+    overlapping [start, start + duration] intervals in the log.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return await awaitable
+    begin = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await awaitable
+        outcome = "ok"
+        return result
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        end = time.perf_counter()
+        logger.debug(
+            "span=%s start=+%.1fms duration=%.1fms outcome=%s",
+            name, (begin - started) * 1000, (end - begin) * 1000, outcome,
+        )
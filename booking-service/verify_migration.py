@@ -5,8 +5,12 @@ async def test_schema():
     query = """
     query {
         bookingsByUser(userId: "test_user") {
-            id
-            status
+            edges {
+                node {
+                    id
+                    status
+                }
+            }
         }
     }
     """
@@ -6,6 +6,9 @@ SPACEMASTER_GRAPHQL = os.getenv(
     "https://7318c00bb235.ngrok-free.app/graphql"
 )
 
+# booking-service caches event metadata and is told when it changes
+BOOKING_CACHE_INVALIDATE_URL = os.getenv("BOOKING_CACHE_INVALIDATE_URL", "")
+
 EVENT_STATUS_SCHEDULED = "SCHEDULED"
 EVENT_STATUS_ONGOING = "ONGOING"
 EVENT_STATUS_COMPLETED = "COMPLETED"
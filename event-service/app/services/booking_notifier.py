@@ -0,0 +1,32 @@
+import os
+import threading
+
+import requests
+
+from app.constants import BOOKING_CACHE_INVALIDATE_URL
+
+GATEWAY_SHARED_SECRET = os.getenv("GATEWAY_SHARED_SECRET", "")
+
+
+def notify_booking_cache(event_id, scope="event"):
+    """Beri tahu booking-service agar membuang cache event ini.
+
+    Best effort dan di luar thread request: kalau gagal, booking-service
+    tetap memperbarui entry setelah TTL-nya habis.
+    """
+    if not BOOKING_CACHE_INVALIDATE_URL:
+        return
+    payload = {"event_id": str(event_id), "scope": scope}
+    threading.Thread(target=_post, args=(payload,), daemon=True).start()
+
+
+def _post(payload):
+    try:
+        requests.post(
+            BOOKING_CACHE_INVALIDATE_URL,
+            json=payload,
+            headers={"X-Internal-Secret": GATEWAY_SHARED_SECRET},
+            timeout=2,
+        )
+    except requests.RequestException as e:
+        print(f"Booking cache invalidation failed: {e}")
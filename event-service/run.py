@@ -1,5 +1,5 @@
 from flask import Flask, make_response
-from flask_graphql import GraphQLView
+from app.persisted_queries import PersistedQueryView
 from app.schema import schema
 from app.graphiql_modern import MODERN_GRAPHIQL_HTML
 
@@ -8,7 +8,7 @@ app = Flask(__name__)
 # GraphQL POST endpoint
 app.add_url_rule(
     "/graphql",
-    view_func=GraphQLView.as_view(
+    view_func=PersistedQueryView.as_view(
         "graphql",
         schema=schema,
         graphiql=False  # Disable default GraphiQL
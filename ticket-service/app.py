@@ -1,5 +1,5 @@
 from flask import Flask
-from flask_graphql import GraphQLView
+from persisted_queries import PersistedQueryView
 from config import db, get_database_uri
 from schema import schema
 
@@ -17,7 +17,7 @@ from flask import make_response
 
 app.add_url_rule(
     "/graphql",
-    view_func=GraphQLView.as_view(
+    view_func=PersistedQueryView.as_view(
         "graphql",
         schema=schema,
         graphiql=False
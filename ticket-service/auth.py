@@ -1,12 +1,32 @@
+import hmac
 import os
 import jwt
 from functools import wraps
 
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-secret-123")
+GATEWAY_SHARED_SECRET = os.getenv("GATEWAY_SHARED_SECRET", "")
+
+def get_gateway_payload(headers):
+    # Claims already verified by the API gateway, trusted only with the shared secret
+    secret = headers.get("X-Gateway-Secret")
+    if not GATEWAY_SHARED_SECRET or not secret:
+        return None
+    if not hmac.compare_digest(secret, GATEWAY_SHARED_SECRET):
+        return None
+    user_id = headers.get("X-User-Id")
+    if not user_id:
+        return None
+    return {"sub": user_id, "role": headers.get("X-User-Role")}
 
 def admin_required(fn):
     @wraps(fn)
     def wrapper(root, info, *args, **kwargs):
+        payload = get_gateway_payload(info.context.headers)
+        if payload is not None:
+            if payload.get("role") != "ADMIN":
+                raise Exception("Access Denied: Admin role required")
+            return fn(root, info, *args, **kwargs)
+
         auth_header = info.context.headers.get('Authorization')
         if not auth_header:
              raise Exception("Missing Authorization Header")
@@ -0,0 +1,30 @@
+import threading
+
+import requests
+
+from auth import GATEWAY_SHARED_SECRET
+from config import BOOKING_CACHE_INVALIDATE_URL
+
+
+def notify_booking_cache(event_id, scope="tickets"):
+    """Tell booking-service to drop its cached ticket types for an event.
+
+    Best effort and off the request thread: if it is lost, booking-service
+    still refreshes the entry once its TTL runs out.
+    """
+    if not BOOKING_CACHE_INVALIDATE_URL:
+        return
+    payload = {"event_id": str(event_id), "scope": scope}
+    threading.Thread(target=_post, args=(payload,), daemon=True).start()
+
+
+def _post(payload):
+    try:
+        requests.post(
+            BOOKING_CACHE_INVALIDATE_URL,
+            json=payload,
+            headers={"X-Internal-Secret": GATEWAY_SHARED_SECRET},
+            timeout=2,
+        )
+    except requests.RequestException as e:
+        print(f"Booking cache invalidation failed: {e}")
@@ -15,3 +15,4 @@ def get_database_uri():
     )
 
 EVENT_SERVICE_URL = os.getenv("EVENT_SERVICE_URL", "http://event-service:4001/graphql")
+BOOKING_CACHE_INVALIDATE_URL = os.getenv("BOOKING_CACHE_INVALIDATE_URL", "")
@@ -29,3 +29,13 @@ class TicketType(db.Model):
         server_default=func.now(),
         onupdate=func.now()
     )
+
+
+class TicketSoldCommit(db.Model):
+    """Quota commits already applied, so a redelivered updateTicketSold is a no-op"""
+    __tablename__ = "ticket_sold_commits"
+
+    commit_id = db.Column(db.String(64), primary_key=True)
+    ticket_type_id = db.Column(db.String(36), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import partial
+
+import requests
+
+from flask_graphql import GraphQLView
+from graphql.backend.base import GraphQLDocument
+from graphql.backend.core import GraphQLCoreBackend
+from graphql.execution import ExecutionResult, execute
+from graphql.language.base import parse
+from graphql.validation import validate
+from graphql_server import HttpQueryError, default_format_error
+
+# Distinct operations are few, these bound memory against arbitrary clients
+PERSISTED_QUERY_MAX_ENTRIES = int(os.getenv("PERSISTED_QUERY_MAX_ENTRIES", 1000))
+DOCUMENT_CACHE_MAX_ENTRIES = int(os.getenv("DOCUMENT_CACHE_MAX_ENTRIES", 1000))
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class PersistedQueryNotFound(HttpQueryError):
+    def __init__(self):
+        # 200 like Apollo, the client simply retries with the full query
+        super().__init__(200, "PersistedQueryNotFound")
+
+
+class CachedDocumentBackend(GraphQLCoreBackend):
+    """Parses and validates every distinct document once.
+
+    Documents are kept in an LRU keyed by the SHA-256 of the query text,
+    the same hash clients use for persisted queries.
+    """
+
+    def __init__(self, max_entries: int = DOCUMENT_CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def document_from_string(self, schema, document_string):
+        if not isinstance(document_string, str):
+            return super().document_from_string(schema, document_string)
+        key = query_hash(document_string)
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+                return document
+
+        document_ast = parse(document_string)
+        errors = validate(schema, document_ast)
+        if errors:
+            run = partial(_invalid, errors)
+        else:
+            run = partial(execute, schema, document_ast, **self.execute_params)
+        document = GraphQLDocument(
+            schema=schema,
+            document_string=document_string,
+            document_ast=document_ast,
+            execute=run,
+        )
+        with self._lock:
+            self._documents[key] = document
+            if len(self._documents) > self.max_entries:
+                self._documents.popitem(last=False)
+        return document
+
+
+def _invalid(errors, *args, **kwargs):
+    return ExecutionResult(errors=errors, invalid=True)
+
+
+# Module level because Flask builds a new view instance for every request
+document_backend = CachedDocumentBackend()
+persisted_queries = OrderedDict()
+_persisted_lock = threading.Lock()
+
+
+class PersistedQueryView(GraphQLView):
+    """GraphQLView that understands Automatic Persisted Queries.
+
+    A request may carry extensions.persistedQuery.sha256Hash instead of the
+    query text; unknown hashes answer PersistedQueryNotFound and the client
+    resends the full text once, which is then remembered under its hash.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("backend", document_backend)
+        super().__init__(**kwargs)
+
+    def parse_body(self):
+        data = super().parse_body()
+        if not isinstance(data, dict):
+            return data
+        extensions = data.get("extensions")
+        persisted = extensions.get("persistedQuery") if isinstance(extensions, dict) else None
+        if not isinstance(persisted, dict):
+            return data
+        sha256 = persisted.get("sha256Hash")
+        if persisted.get("version") != 1 or not isinstance(sha256, str):
+            raise HttpQueryError(400, "Unsupported persisted query version")
+
+        query = data.get("query")
+        if query:
+            if query_hash(query) != sha256:
+                raise HttpQueryError(400, "provided sha does not match query")
+            with _persisted_lock:
+                persisted_queries[sha256] = query
+                if len(persisted_queries) > PERSISTED_QUERY_MAX_ENTRIES:
+                    persisted_queries.popitem(last=False)
+            return data
+
+        with _persisted_lock:
+            query = persisted_queries.get(sha256)
+            if query is not None:
+                persisted_queries.move_to_end(sha256)
+        if query is None:
+            raise PersistedQueryNotFound()
+        return dict(data, query=query)
+
+    @staticmethod
+    def format_error(error):
+        formatted = default_format_error(error)
+        if isinstance(error, PersistedQueryNotFound):
+            formatted["extensions"] = {"code": "PERSISTED_QUERY_NOT_FOUND"}
+        return formatted
+
+
+# (url, hash) pairs the other service has already seen in full
+_registered = set()
+
+
+def post_graphql(url: str, query: str, variables: dict = None, timeout: float = 5) -> requests.Response:
+    """POST a GraphQL operation to another service as a persisted query.
+
+    Only the hash is sent once the service has seen the full text; if it
+    forgot it (e.g. after a restart) the full text is sent again.
+    """
+    sha256 = query_hash(query)
+    extensions = {"persistedQuery": {"version": 1, "sha256Hash": sha256}}
+    if (url, sha256) in _registered:
+        response = requests.post(
+            url, json={"variables": variables, "extensions": extensions}, timeout=timeout
+        )
+        if not _is_not_found(response):
+            return response
+        _registered.discard((url, sha256))
+
+    response = requests.post(
+        url, json={"query": query, "variables": variables, "extensions": extensions}, timeout=timeout
+    )
+    if response.status_code == 200 and not _is_not_found(response):
+        _registered.add((url, sha256))
+    return response
+
+
+def _is_not_found(response: requests.Response) -> bool:
+    if response.status_code != 200 or b"PersistedQueryNotFound" not in response.content:
+        return False
+    try:
+        errors = response.json().get("errors") or []
+    except ValueError:
+        return False
+    return any(error.get("message") == "PersistedQueryNotFound" for error in errors)
@@ -1,7 +1,9 @@
 ﻿import graphene
 import uuid
-import requests
-from models import TicketType as TicketModel, TicketCategory as CategoryEnum, TicketStatus as StatusEnum
+from persisted_queries import post_graphql
+from booking_notifier import notify_booking_cache
+from sqlalchemy.exc import IntegrityError
+from models import TicketType as TicketModel, TicketSoldCommit, TicketCategory as CategoryEnum, TicketStatus as StatusEnum
 from config import db
 from auth import admin_required
 
@@ -65,11 +67,7 @@ class CreateTicketType(graphene.Mutation):
         event_status = "SCHEDULED"
 
         try:
-            res = requests.post(
-                EVENT_SERVICE_URL,
-                json={"query": event_query, "variables": {"id": str(input.event_id)}},
-                timeout=5
-            )
+            res = post_graphql(EVENT_SERVICE_URL, event_query, {"id": str(input.event_id)}, timeout=5)
             res.raise_for_status()
             data = res.json()
             event_data = data.get("data", {}).get("event")
@@ -116,6 +114,7 @@ class CreateTicketType(graphene.Mutation):
         )
         db.session.add(ticket)
         db.session.commit()
+        notify_booking_cache(ticket.event_id)
         return ticket
 
 class DeleteTicketType(graphene.Mutation):
@@ -133,8 +132,10 @@ class DeleteTicketType(graphene.Mutation):
         if ticket.sold > 0:
             raise Exception("Cannot delete ticket type that has been sold")
         
+        event_id = ticket.event_id
         db.session.delete(ticket)
         db.session.commit()
+        notify_booking_cache(event_id)
         return DeleteTicketType(ok=True)
 
 class UpdateTicketType(graphene.Mutation):
@@ -168,11 +169,7 @@ class UpdateTicketType(graphene.Mutation):
         """
         venue_capacity = 0
         try:
-            res = requests.post(
-                EVENT_SERVICE_URL,
-                json={"query": event_query, "variables": {"id": str(ticket.event_id)}},
-                timeout=5
-            )
+            res = post_graphql(EVENT_SERVICE_URL, event_query, {"id": str(ticket.event_id)}, timeout=5)
             res.raise_for_status()
             data = res.json()
             event_data = data.get("data", {}).get("event", {})
@@ -220,19 +217,25 @@ class UpdateTicketType(graphene.Mutation):
             ticket.status = StatusEnum(input.status)
             
         db.session.commit()
+        notify_booking_cache(ticket.event_id)
         return ticket
 
 class UpdateTicketSold(graphene.Mutation):
     class Arguments:
         id = graphene.ID(required=True)
         quantity = graphene.Int(required=True)
+        # Set by booking-service; a commit that was already applied is not counted again
+        commit_id = graphene.String()
 
     Output = TicketType
 
-    def mutate(self, info, id, quantity):
+    def mutate(self, info, id, quantity, commit_id=None):
         ticket = TicketModel.query.filter_by(id=str(id)).first()
         if not ticket:
             raise Exception("Ticket not found")
+
+        if commit_id and db.session.get(TicketSoldCommit, commit_id):
+            return ticket
         
         if (ticket.quota - ticket.sold) < quantity:
              raise Exception(f"Not enough quota. Remaining: {ticket.quota - ticket.sold}")
@@ -241,8 +244,17 @@ class UpdateTicketSold(graphene.Mutation):
         
         if ticket.sold >= ticket.quota:
             ticket.status = StatusEnum.SOLD_OUT
-            
-        db.session.commit()
+
+        if commit_id:
+            db.session.add(TicketSoldCommit(commit_id=commit_id, ticket_type_id=ticket.id, quantity=quantity))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # The same commit was applied concurrently
+            db.session.rollback()
+            return TicketModel.query.filter_by(id=str(id)).first()
+        # No booking cache notification: sales only come from booking-service,
+        # which refreshes its own cache once the commit is delivered
         return ticket
 
 class Mutation(graphene.ObjectType):
@@ -17,7 +17,7 @@ migrate = Migrate(app, db)
 # Allow CORS for all domains on all routes, specifically for Authorization header
 CORS(app, resources={r"/*": {"origins": "*"}}, allow_headers=["Content-Type", "Authorization"])
 
-from flask_graphql import GraphQLView
+from persisted_queries import PersistedQueryView
 from schema import schema
 
 
@@ -31,7 +31,7 @@ from flask import make_response
 # GraphQL Endpoint (POST only for processing)
 app.add_url_rule(
     '/graphql',
-    view_func=GraphQLView.as_view(
+    view_func=PersistedQueryView.as_view(
         'graphql',
         schema=schema,
         graphiql=False
@@ -16,4 +16,5 @@ class Config:
     SERVICE_NAME = os.getenv('SERVICE_NAME', 'user-service')
     
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-secret-123')
+    GATEWAY_SHARED_SECRET = os.getenv('GATEWAY_SHARED_SECRET', '')
     JWT_ACCESS_TOKEN_EXPIRES = 86400 
\ No newline at end of file
@@ -1,10 +1,12 @@
 import graphene
 from graphene_sqlalchemy import SQLAlchemyObjectType
 from models import User as UserModel, db
-from flask_jwt_extended import create_access_token, decode_token, get_jwt_identity, verify_jwt_in_request, get_jwt
+from flask_jwt_extended import create_access_token, decode_token, verify_jwt_in_request, get_jwt
 import bcrypt
 from functools import wraps
 from flask import request
+from config import Config
+import hmac
 import re
 
 EMAIL_REGEX = r'^[\w\.-]+@[\w\.-]+\.\w+$'
@@ -18,11 +20,29 @@ def validate_phone(phone):
     if phone and not re.match(PHONE_REGEX, phone):
         raise Exception("Invalid phone number format (must be 10-15 digits)")
 
+def get_gateway_claims():
+    # Claims already verified by the API gateway, trusted only with the shared secret
+    secret = request.headers.get('X-Gateway-Secret')
+    if not Config.GATEWAY_SHARED_SECRET or not secret:
+        return None
+    if not hmac.compare_digest(secret, Config.GATEWAY_SHARED_SECRET):
+        return None
+    user_id = request.headers.get('X-User-Id')
+    if not user_id:
+        return None
+    return {"sub": user_id, "role": request.headers.get('X-User-Role')}
+
+def get_current_claims():
+    claims = get_gateway_claims()
+    if claims is not None:
+        return claims
+    verify_jwt_in_request()
+    return get_jwt()
+
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        verify_jwt_in_request()
-        claims = get_jwt()
+        claims = get_current_claims()
         if claims.get("role") != "ADMIN":
             raise Exception("Access Denied: Admin role required")
         return fn(*args, **kwargs)
@@ -31,9 +51,8 @@ def admin_required(fn):
 def owner_or_admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        verify_jwt_in_request()
-        claims = get_jwt()
-        current_user_id = get_jwt_identity()
+        claims = get_current_claims()
+        current_user_id = claims.get("sub")
         
         if claims.get("role") == "ADMIN":
             return fn(*args, **kwargs)
@@ -163,8 +182,7 @@ class Query(graphene.ObjectType):
              raise Exception("Missing Authorization Header")
         
         try:
-            verify_jwt_in_request()
-            claims = get_jwt()
+            claims = get_current_claims()
             if claims.get("role") != "ADMIN":
                  raise Exception("Access Denied: Admin role required to view other user details")
         except Exception as e: